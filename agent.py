@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import os
+import threading
+import traceback
+
+import psutil
+
+import server
+
+content_types = {
+    "openmetrics": b"application/openmetrics-text; version=1.0.0; charset=utf-8",
+    "text": b"text/plain; version=0.0.4; charset=utf-8",
+}
+
+request_timeout = 5.0
+
+not_found = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+method_not_allowed = b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Exposition(object):
+    def __init__(self, prefix: str = "monitor"):
+        self.prefix = prefix
+        self.generation = 0
+
+        self._labels = {}
+        self._headers = {}
+        self._body = b"# EOF\n"
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def labels(self, labels: tuple, used: dict) -> str:
+        rendered = self._labels.get(labels)
+
+        # Devices, mounts and interfaces hardly ever change, so each label set is escaped and joined only once.
+        if rendered is None:
+            rendered = "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+        used[labels] = rendered
+
+        return rendered
+
+    def update(self, families: list):
+        lines = []
+        used = {}
+
+        for name, help_text, samples in families:
+            header = self._headers.get(name)
+
+            if header is None:
+                header = f"# HELP {self.prefix}_{name} {help_text}\n# TYPE {self.prefix}_{name} gauge\n"
+                self._headers[name] = header
+
+            lines.append(header)
+
+            for labels, value in samples:
+                lines.append(f"{self.prefix}_{name}{self.labels(labels, used) if labels else ''} {value}\n")
+
+        lines.append("# EOF\n")
+
+        # Only the label sets of this sample stay cached, vanished devices and interfaces are forgotten.
+        self._labels = used
+
+        body = "".join(lines).encode()
+
+        with self._lock:
+            self._body = body
+            self._responses = {}
+            self.generation += 1
+
+    def response(self, content_type: str) -> bytes:
+        with self._lock:
+            response = self._responses.get(content_type)
+
+            # Scrapes between two samples get the very same bytes, whatever the scrape frequency.
+            if response is None:
+                response = (
+                    b"HTTP/1.1 200 OK\r\nContent-Type: " + content_types[content_type]
+                    + f"\r\nContent-Length: {len(self._body)}\r\nConnection: close\r\n\r\n".encode()
+                    + self._body
+                )
+                self._responses[content_type] = response
+
+            return response
+
+
+def collect_families(snapshots: dict) -> list:
+    cpu_info = server.get_cpu_info()
+    memory = psutil.virtual_memory()
+
+    # Byte metrics come straight from psutil, the collectors round them to gigabytes for the client.
+    partitions = []
+
+    for partition in server.disk_partitions.get():
+        try:
+            disk_usage = psutil.disk_usage(partition.mountpoint)
+        except OSError:
+            continue
+
+        labels = (("device", partition.device), ("mountpoint", partition.mountpoint), ("fstype", partition.fstype))
+        partitions.append((labels, disk_usage))
+
+    devices = sorted(snapshots["disk"]["devices"].items())
+    interfaces = sorted(snapshots["network"]["interfaces"].items())
+
+    return [
+        ("cpu_usage_percent", "Overall CPU usage.", [((), cpu_info["usage"])]),
+        ("cpu_core_usage_percent", "CPU usage per logical core.", [
+            ((("core", str(core)),), usage) for core, usage in enumerate(cpu_info["cores_usage"])
+        ]),
+        ("cpu_frequency_mhz", "Current CPU frequency.", [((), cpu_info["current_frequency"])]),
+        ("memory_total_bytes", "Total physical memory.", [((), memory.total)]),
+        ("memory_used_bytes", "Used physical memory.", [((), memory.used)]),
+        ("memory_available_bytes", "Available physical memory.", [((), memory.available)]),
+        ("memory_usage_percent", "Physical memory usage.", [((), memory.percent)]),
+        ("disk_total_bytes", "Size of each mounted partition.", [
+            (labels, disk_usage.total) for labels, disk_usage in partitions
+        ]),
+        ("disk_used_bytes", "Used space of each mounted partition.", [
+            (labels, disk_usage.used) for labels, disk_usage in partitions
+        ]),
+        ("disk_usage_percent", "Usage of each mounted partition.", [
+            (labels, disk_usage.percent) for labels, disk_usage in partitions
+        ]),
+        ("disk_read_bytes_per_second", "Bytes read per second by device.", [
+            ((("device", device),), rates["read_bytes_per_second"]) for device, rates in devices
+        ]),
+        ("disk_written_bytes_per_second", "Bytes written per second by device.", [
+            ((("device", device),), rates["write_bytes_per_second"]) for device, rates in devices
+        ]),
+        ("disk_reads_per_second", "Read operations per second by device.", [
+            ((("device", device),), rates["read_iops"]) for device, rates in devices
+        ]),
+        ("disk_writes_per_second", "Write operations per second by device.", [
+            ((("device", device),), rates["write_iops"]) for device, rates in devices
+        ]),
+        ("network_received_bytes_per_second", "Bytes received per second by interface.", [
+            ((("interface", interface),), rates["bytes_received_per_second"]) for interface, rates in interfaces
+        ]),
+        ("network_sent_bytes_per_second", "Bytes sent per second by interface.", [
+            ((("interface", interface),), rates["bytes_sent_per_second"]) for interface, rates in interfaces
+        ]),
+        ("network_received_packets_per_second", "Packets received per second by interface.", [
+            ((("interface", interface),), rates["packets_received_per_second"]) for interface, rates in interfaces
+        ]),
+        ("network_sent_packets_per_second", "Packets sent per second by interface.", [
+            ((("interface", interface),), rates["packets_sent_per_second"]) for interface, rates in interfaces
+        ]),
+        ("network_errors_per_second", "Receive and send errors per second by interface.", [
+            ((("interface", interface), ("direction", "in")), rates["errors_in_per_second"])
+            for interface, rates in interfaces
+        ] + [
+            ((("interface", interface), ("direction", "out")), rates["errors_out_per_second"])
+            for interface, rates in interfaces
+        ]),
+    ]
+
+
+class MetricsEndpoint(object):
+    def __init__(self, exposition: Exposition, path: str = "/metrics"):
+        self.exposition = exposition
+        self.path = path
+
+    def on_sample(self, timestamp: float, snapshots: dict):
+        self.exposition.update(collect_families(snapshots))
+
+    async def handle_connection(self, stream_reader: asyncio.StreamReader, stream_writer: asyncio.StreamWriter):
+        try:
+            # A client that connects and never finishes its request is dropped instead of holding the socket.
+            request_line, accept = await asyncio.wait_for(self._read_request(stream_reader), request_timeout)
+            parts = request_line.decode("latin-1").split()
+
+            if len(parts) < 2 or parts[0] != "GET":
+                stream_writer.write(method_not_allowed)
+            elif parts[1].split("?", 1)[0] != self.path:
+                stream_writer.write(not_found)
+            else:
+                content_type = "openmetrics" if "application/openmetrics-text" in accept else "text"
+                stream_writer.write(self.exposition.response(content_type))
+
+            await stream_writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            stream_writer.close()
+
+    async def _read_request(self, stream_reader: asyncio.StreamReader) -> tuple:
+        request_line = await stream_reader.readline()
+        accept = ""
+
+        while True:
+            line = await stream_reader.readline()
+
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+            name, _, value = line.decode("latin-1").partition(":")
+
+            if name.strip().lower() == "accept":
+                accept = value
+
+        return request_line, accept
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Agente sem interface que expõe as métricas no formato OpenMetrics.")
+    parser.add_argument(
+        "--host", default=os.environ.get("MONITOR_HOST", "127.0.0.1"),
+        help="endereço das métricas (MONITOR_HOST)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=int(os.environ.get("MONITOR_PORT", "9464")),
+        help="porta das métricas (MONITOR_PORT)",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=float(os.environ.get("MONITOR_INTERVAL", str(server.sampler_interval))),
+        help="intervalo de amostragem em segundos (MONITOR_INTERVAL)",
+    )
+    parser.add_argument(
+        "--server-port", type=int,
+        default=int(os.environ["MONITOR_SERVER_PORT"]) if os.environ.get("MONITOR_SERVER_PORT") else None,
+        help="também atende o protocolo do cliente nesta porta (MONITOR_SERVER_PORT)",
+    )
+
+    return parser.parse_args()
+
+
+async def serve(arguments, endpoint: MetricsEndpoint):
+    metrics_server = await asyncio.start_server(endpoint.handle_connection, arguments.host, arguments.port)
+
+    print(f"Métricas em http://{arguments.host}:{arguments.port}{endpoint.path}")
+
+    async with metrics_server:
+        if arguments.server_port is None:
+            await metrics_server.serve_forever()
+        else:
+            await asyncio.gather(
+                metrics_server.serve_forever(), server.serve(arguments.host, arguments.server_port)
+            )
+
+
+def main():
+    arguments = parse_arguments()
+    endpoint = MetricsEndpoint(Exposition())
+
+    server.static_facts.get()
+
+    server.sampler.interval = arguments.interval
+    server.sampler.add_listener(endpoint.on_sample)
+    server.sampler.add_listener(server.record_rollups)
+    server.sampler.start()
+
+    try:
+        asyncio.run(serve(arguments, endpoint))
+    except KeyboardInterrupt:
+        pass
+
+    server.sampler.stop()
+    print("Agente encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import heapq
+import os
+import random
+import time
+
+from protocol import ERROR, PUSH, SUBSCRIBE, read_frame
+from serialization import MessageCodec
+from server import MonitorServer
+
+fleet_data_names = ["cpu", "ram"]
+fleet_top_hosts = 10
+
+
+def parse_node(node: str) -> tuple:
+    host, _, port = node.strip().rpartition(":")
+
+    return host, int(port)
+
+
+class NodeConnection(object):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        interval: float = 2.0,
+        connect_timeout: float = 5.0,
+        minimum_backoff: float = 1.0,
+        maximum_backoff: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}"
+        self.interval = interval
+        self.connect_timeout = connect_timeout
+        self.minimum_backoff = minimum_backoff
+        self.maximum_backoff = maximum_backoff
+
+        self.connected = False
+        self.error = None
+        self.samples = {}
+        self.updated_at = None
+
+    def fresh(self, now: float) -> bool:
+        # A node that stopped pushing without closing the connection drops out after a few missed samples.
+        return self.connected and self.updated_at is not None and now - self.updated_at < self.interval * 3
+
+    async def run(self):
+        backoff = self.minimum_backoff
+
+        while True:
+            try:
+                stream_reader, stream_writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.connect_timeout
+                )
+            except (OSError, asyncio.TimeoutError) as exception:
+                self.error = str(exception) or type(exception).__name__
+            else:
+                backoff = self.minimum_backoff
+
+                try:
+                    await self._receive(stream_reader, stream_writer)
+                except Exception as exception:
+                    # Whatever broke the connection, the node keeps being retried with backoff.
+                    self.error = str(exception) or type(exception).__name__
+                finally:
+                    self.connected = False
+                    stream_writer.close()
+
+            # Jitter keeps a whole fleet that went down together from reconnecting in the same instant.
+            await asyncio.sleep(random.uniform(backoff / 2, backoff))
+            backoff = min(backoff * 2, self.maximum_backoff)
+
+    async def _receive(self, stream_reader: asyncio.StreamReader, stream_writer: asyncio.StreamWriter):
+        codec = MessageCodec()
+
+        # One subscription per data name, the server pushes and the aggregator never polls.
+        for subscription_id, data_name in enumerate(fleet_data_names, 1):
+            message = {"data": data_name, "interval": self.interval}
+            stream_writer.write(codec.encode(SUBSCRIBE, subscription_id, message))
+
+        await stream_writer.drain()
+
+        self.connected = True
+        self.error = None
+
+        while True:
+            frame = await read_frame(stream_reader)
+            data = codec.decode(frame)
+
+            if frame.message_type == PUSH and 0 < frame.request_id <= len(fleet_data_names):
+                self.samples[fleet_data_names[frame.request_id - 1]] = data
+                self.updated_at = time.monotonic()
+            elif frame.message_type == ERROR:
+                self.error = data["error"]
+
+
+class Aggregator(object):
+    def __init__(self, nodes: list, interval: float = 2.0):
+        self.nodes = [NodeConnection(host, port, interval) for host, port in nodes]
+
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(node.run()) for node in self.nodes]
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def get_fleet_nodes(self) -> list:
+        now = time.monotonic()
+        nodes = []
+
+        for node in self.nodes:
+            cpu = node.samples.get("cpu")
+            ram = node.samples.get("ram")
+            fresh = node.fresh(now)
+
+            nodes.append({
+                "node": node.name,
+                "up": fresh,
+                "cpu_usage": cpu["usage"] if fresh and cpu is not None else None,
+                "ram_percent_usage": ram["percent_usage"] if fresh and ram is not None else None,
+                "ram_used_gb": ram["used_gb"] if fresh and ram is not None else None,
+                "ram_total_gb": ram["total_gb"] if fresh and ram is not None else None,
+                "error": node.error,
+            })
+
+        return nodes
+
+    def get_fleet(self) -> dict:
+        nodes = self.get_fleet_nodes()
+
+        with_cpu = [node for node in nodes if node["cpu_usage"] is not None]
+        with_ram = [node for node in nodes if node["ram_total_gb"] is not None]
+
+        used_gb = sum(node["ram_used_gb"] for node in with_ram)
+        total_gb = sum(node["ram_total_gb"] for node in with_ram)
+
+        return {
+            "nodes": len(nodes),
+            "up": sum(node["up"] for node in nodes),
+            "cpu_usage_average": sum(node["cpu_usage"] for node in with_cpu) / len(with_cpu) if with_cpu else None,
+            "top_cpu": [
+                {"node": node["node"], "cpu_usage": node["cpu_usage"]}
+                for node in heapq.nlargest(fleet_top_hosts, with_cpu, key=lambda node: node["cpu_usage"])
+            ],
+            "top_ram": [
+                {"node": node["node"], "ram_percent_usage": node["ram_percent_usage"]}
+                for node in heapq.nlargest(fleet_top_hosts, with_ram, key=lambda node: node["ram_percent_usage"])
+            ],
+            "ram_used_gb": round(used_gb, 2),
+            "ram_total_gb": round(total_gb, 2),
+            "ram_percent_usage": round(used_gb / total_gb * 100, 1) if total_gb else None,
+        }
+
+    def collectors(self) -> dict:
+        return {
+            "fleet": self.get_fleet,
+            "fleet_nodes": self.get_fleet_nodes,
+        }
+
+
+async def serve(aggregator: Aggregator, host: str, port: int):
+    aggregator.start()
+
+    # The fleet view goes out over the same protocol, so the client and other aggregators can read it.
+    monitor_server = MonitorServer(aggregator.collectors())
+    fleet_server = await asyncio.start_server(monitor_server.handle_connection, host, port)
+
+    print(f"Agregador iniciado com {len(aggregator.nodes)} servidores")
+
+    try:
+        async with fleet_server:
+            await fleet_server.serve_forever()
+    finally:
+        monitor_server.close()
+        aggregator.close()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Agrega os dados de vários servidores em uma visão da frota.")
+    parser.add_argument(
+        "--nodes", default=os.environ.get("MONITOR_NODES", ""),
+        help="servidores no formato host:porta separados por vírgula (MONITOR_NODES)",
+    )
+    parser.add_argument("--nodes-file", help="arquivo com um host:porta por linha")
+    parser.add_argument(
+        "--host", default=os.environ.get("MONITOR_HOST", "127.0.0.1"),
+        help="endereço do agregador (MONITOR_HOST)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=int(os.environ.get("MONITOR_PORT", "5050")),
+        help="porta do agregador (MONITOR_PORT)",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=float(os.environ.get("MONITOR_INTERVAL", "2")),
+        help="intervalo das assinaturas em segundos (MONITOR_INTERVAL)",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+
+    nodes = [node for node in arguments.nodes.split(",") if node.strip()]
+
+    if arguments.nodes_file is not None:
+        with open(arguments.nodes_file) as nodes_file:
+            nodes.extend(line for line in nodes_file.read().split() if line)
+
+    aggregator = Aggregator([parse_node(node) for node in nodes], arguments.interval)
+
+    try:
+        asyncio.run(serve(aggregator, arguments.host, arguments.port))
+    except KeyboardInterrupt:
+        pass
+
+    print("Agregador encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import pickle
+import random
+import socket
+import time
+import timeit
+import uuid
+
+from aggregator import Aggregator
+from protocol import HEADER, PUSH, REQUEST, RESPONSE, SUBSCRIBE, Frame, read_frame
+from server import MonitorServer
+from scanner import parse_ports, scanners
+from serialization import SCHEMAS, MSGPACK, STRUCT, MessageCodec
+
+
+def sample_records(cores: int, processes: int):
+    return {
+        "cpu": {
+            "static_version": 3735928559,
+            "current_frequency": 2893.45,
+            "usage": 37.5,
+            "cores_usage": [round(random.uniform(0, 100), 1) for _ in range(cores)],
+        },
+        "ram": {
+            "total_gb": 31.27,
+            "used_gb": 12.84,
+            "available_gb": 18.43,
+            "percent_usage": 41.1,
+            "percent_available": 58.9,
+        },
+        "disk": {
+            "read_bytes_per_second": 5242880.0,
+            "write_bytes_per_second": 1048576.0,
+            "read_iops": 120.0,
+            "write_iops": 45.0,
+            "partitions": [
+                {
+                    "device": "/dev/sda1",
+                    "mountpoint": "/",
+                    "fstype": "ext4",
+                    "total_gb": 467.85,
+                    "used_gb": 201.33,
+                    "available_gb": 242.68,
+                    "used_percent": 45.3,
+                },
+            ],
+            "devices": [
+                {
+                    "device": "sda",
+                    "read_bytes_per_second": 5242880.0,
+                    "write_bytes_per_second": 1048576.0,
+                    "read_iops": 120.0,
+                    "write_iops": 45.0,
+                },
+            ],
+        },
+        "processes": [
+            {
+                "name": f"process-{pid}",
+                "used_memory": random.uniform(1, 500),
+                "memory_use_percent": random.uniform(0, 5),
+                "used_threads": random.randint(1, 64),
+                "cpu_percent": random.uniform(0, 100),
+                "cpu_time": random.uniform(0, 1000),
+                "created_date": "Mon Jan  4 10:20:30 2021",
+            }
+            for pid in range(processes)
+        ],
+    }
+
+
+def time_call(function, repeat: int) -> float:
+    return min(timeit.repeat(function, number=repeat, repeat=5)) / repeat * 1_000_000
+
+
+def benchmark_serialization(args):
+    records = sample_records(args.cores, args.processes)
+
+    print(f"{'record':<10} {'format':<8} {'bytes':>9} {'encode us':>10} {'decode us':>10}")
+
+    for name, record in records.items():
+        message = {"uuid": str(uuid.uuid4()), "data": record}
+        pickled = pickle.dumps(message)
+
+        print(f"{name:<10} {'pickle':<8} {len(pickled):>9} "
+              f"{time_call(lambda: pickle.dumps(message), args.repeat):>10.2f} "
+              f"{time_call(lambda: pickle.loads(pickled), args.repeat):>10.2f}")
+
+        encoder = MessageCodec()
+        decoder = MessageCodec()
+
+        # The first message for a schema also carries its field names, feed it to the decoder once.
+        first_message = encoder.encode(RESPONSE, 1, record, name)
+        offset = 0
+        while offset < len(first_message):
+            length, message_type, payload_format, request_id = HEADER.unpack_from(first_message, offset)
+            offset += HEADER.size
+            decoder.decode(Frame(message_type, payload_format, request_id, first_message[offset:offset + length]))
+            offset += length
+
+        encoded = encoder.encode(RESPONSE, 1, record, name)
+        payload_format = STRUCT if SCHEMAS.get(name) is not None and SCHEMAS[name].matches(record) else MSGPACK
+        frame = Frame(RESPONSE, payload_format, 1, encoded[HEADER.size:])
+
+        print(f"{name:<10} {'struct' if payload_format == STRUCT else 'msgpack':<8} {len(encoded):>9} "
+              f"{time_call(lambda: encoder.encode(RESPONSE, 1, record, name), args.repeat):>10.2f} "
+              f"{time_call(lambda: decoder.decode(frame), args.repeat):>10.2f}")
+
+
+def benchmark_scanner(args):
+    listeners = []
+
+    for port in parse_ports(args.listen) if args.listen else []:
+        listener = socket.socket()
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((args.target, port))
+        listener.listen()
+        listeners.append(listener)
+
+    try:
+        for backend, scanner_class in scanners.items():
+            start = time.perf_counter()
+
+            try:
+                hosts = scanner_class().scan(args.target, args.ports)
+            except Exception as exception:
+                print(f"{backend:<6} unavailable: {exception}")
+                continue
+
+            elapsed = time.perf_counter() - start
+            open_ports = sorted(
+                port["port"] for host in hosts for protocol in host["protocols"] for port in protocol["ports"]
+            )
+
+            print(f"{backend:<6} {elapsed * 1000:>9.1f} ms  open ports: {open_ports}")
+    finally:
+        for listener in listeners:
+            listener.close()
+
+
+class FakeNode(object):
+    def __init__(self, cores: int = 8):
+        self.cores = cores
+        self.pushes = 0
+
+    def sample(self, data_name: str) -> dict:
+        if data_name == "cpu":
+            return {
+                "static_version": 1,
+                "current_frequency": 2893.45,
+                "usage": round(random.uniform(0, 100), 1),
+                "cores_usage": [round(random.uniform(0, 100), 1) for _ in range(self.cores)],
+            }
+
+        used_gb = round(random.uniform(1, 15), 2)
+
+        return {
+            "total_gb": 16.0,
+            "used_gb": used_gb,
+            "available_gb": round(16.0 - used_gb, 2),
+            "percent_usage": round(used_gb / 16.0 * 100, 1),
+            "percent_available": round(100 - used_gb / 16.0 * 100, 1),
+        }
+
+    async def handle_connection(self, stream_reader, stream_writer):
+        codec = MessageCodec()
+        tasks = []
+
+        try:
+            while True:
+                frame = await read_frame(stream_reader)
+                message = codec.decode(frame)
+
+                if frame.message_type == SUBSCRIBE:
+                    tasks.append(asyncio.create_task(self._push(codec, stream_writer, frame.request_id, message)))
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            stream_writer.close()
+
+    async def _push(self, codec: MessageCodec, stream_writer, subscription_id: int, message: dict):
+        # Nodes start out of phase, like real servers that were not started in the same second.
+        await asyncio.sleep(random.uniform(0, message["interval"]))
+
+        while True:
+            stream_writer.write(codec.encode(PUSH, subscription_id, self.sample(message["data"]), message["data"]))
+            self.pushes += 1
+
+            await asyncio.sleep(message["interval"])
+
+
+async def request_fleet(port: int, data_name: str):
+    stream_reader, stream_writer = await asyncio.open_connection("127.0.0.1", port)
+    codec = MessageCodec()
+
+    stream_writer.write(codec.encode(REQUEST, 1, {"data": data_name}))
+
+    try:
+        while True:
+            frame = await read_frame(stream_reader)
+            data = codec.decode(frame)
+
+            if frame.request_id == 1:
+                return data
+    finally:
+        stream_writer.close()
+
+
+async def run_aggregator_benchmark(args):
+    nodes = [FakeNode(args.cores) for _ in range(args.nodes)]
+    node_servers = [await asyncio.start_server(node.handle_connection, "127.0.0.1", 0) for node in nodes]
+
+    aggregator = Aggregator([server.sockets[0].getsockname()[:2] for server in node_servers], args.interval)
+    monitor_server = MonitorServer(aggregator.collectors())
+    fleet_server = await asyncio.start_server(monitor_server.handle_connection, "127.0.0.1", 0)
+    fleet_port = fleet_server.sockets[0].getsockname()[1]
+
+    start = time.perf_counter()
+    aggregator.start()
+
+    fleet = {"up": 0}
+    while fleet["up"] < args.nodes and time.perf_counter() - start < 30:
+        await asyncio.sleep(0.1)
+        fleet = aggregator.get_fleet()
+
+    print(f"{fleet['up']}/{args.nodes} nodes up after {time.perf_counter() - start:.2f} s")
+
+    pushes = sum(node.pushes for node in nodes)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    await asyncio.sleep(args.duration)
+
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    pushes = sum(node.pushes for node in nodes) - pushes
+
+    # The fake nodes run in the same process, so the share below is an upper bound for the aggregator alone.
+    print(f"{pushes / wall:.0f} samples/s, {cpu / wall * 100:.1f}% of one core for nodes and aggregator together")
+
+    for data_name in ("fleet", "fleet_nodes"):
+        request_start = time.perf_counter()
+        data = await request_fleet(fleet_port, data_name)
+        elapsed = (time.perf_counter() - request_start) * 1000
+
+        summary = f"up {data['up']}/{data['nodes']}, top {data['top_cpu'][0]}" if data_name == "fleet" else len(data)
+        print(f"{data_name:<12} {elapsed:>8.2f} ms  {summary}")
+
+    aggregator.close()
+    monitor_server.close()
+    fleet_server.close()
+
+    # Gives the fake nodes a moment to see their connections close before the loop goes away.
+    await asyncio.sleep(0.5)
+
+    for server in node_servers:
+        server.close()
+
+
+def benchmark_aggregator(args):
+    asyncio.run(run_aggregator_benchmark(args))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    serialization_parser = subparsers.add_parser("serialization")
+    serialization_parser.add_argument("--cores", type=int, default=64)
+    serialization_parser.add_argument("--processes", type=int, default=1000)
+    serialization_parser.add_argument("--repeat", type=int, default=200)
+    serialization_parser.set_defaults(function=benchmark_serialization)
+
+    scanner_parser = subparsers.add_parser("scanner")
+    scanner_parser.add_argument("--target", default="127.0.0.1")
+    scanner_parser.add_argument("--ports", default="22-443")
+    scanner_parser.add_argument("--listen", default="", help="ports to open local listeners on, e.g. 80,443")
+    scanner_parser.set_defaults(function=benchmark_scanner)
+
+    aggregator_parser = subparsers.add_parser("aggregator")
+    aggregator_parser.add_argument("--nodes", type=int, default=500)
+    aggregator_parser.add_argument("--cores", type=int, default=8)
+    aggregator_parser.add_argument("--interval", type=float, default=2.0)
+    aggregator_parser.add_argument("--duration", type=float, default=10.0)
+    aggregator_parser.set_defaults(function=benchmark_aggregator)
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import math
+
+import numpy
+import pygame
+from matplotlib import cm
+from matplotlib.backends import backend_agg
+from matplotlib.colors import to_rgb
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.ticker import FuncFormatter
+
+
+def nice_limit(value: float) -> float:
+    if value <= 0:
+        return 1.0
+
+    magnitude = 10 ** math.floor(math.log10(value))
+
+    for step in (1, 2, 5, 10):
+        if value <= step * magnitude:
+            return step * magnitude
+
+
+class FrameBridge(object):
+    def __init__(self, canvas: backend_agg.FigureCanvasAgg):
+        self.canvas = canvas
+        self.surface = None
+
+        self._renderer = None
+        self._buffer = None
+
+    def draw(self) -> pygame.Surface:
+        self.canvas.draw()
+
+        renderer = self.canvas.get_renderer()
+
+        # Agg keeps drawing into the same renderer while the figure keeps its size, so the surface
+        # wraps its pixels once and every later draw shows up in it without copying.
+        if renderer is not self._renderer:
+            self._renderer = renderer
+            self._buffer = self.canvas.buffer_rgba()
+            self.surface = pygame.image.frombuffer(self._buffer, self.canvas.get_width_height(), "RGBX")
+
+        return self.surface
+
+
+class LineChart(object):
+    def __init__(
+        self,
+        points: int,
+        figsize: list = None,
+        dpi: int = 75,
+        y_limit: float = 100,
+        formatter=None,
+        autoscale: bool = False,
+    ):
+        self.points = points
+        self.y_limit = y_limit
+        self.autoscale = autoscale
+
+        self.figure = Figure(figsize=[7, 4] if figsize is None else figsize, dpi=dpi)
+        self.axes = self.figure.gca()
+
+        self.axes.set_ylim(0, y_limit)
+        self.axes.set_xlim(1, points)
+
+        if formatter is not None:
+            self.axes.yaxis.set_major_formatter(FuncFormatter(formatter))
+
+        self.canvas = backend_agg.FigureCanvasAgg(self.figure)
+        self.bridge = FrameBridge(self.canvas)
+
+        self.labels = []
+        self.colors = []
+        self.widths = []
+        self.surface = None
+
+        self._background = None
+        self._plot_area = None
+        self._points = None
+
+    def set_series(self, labels: list, widths: list = None):
+        if labels == self.labels:
+            return
+
+        self.labels = list(labels)
+        self.widths = [1] * len(labels) if widths is None else list(widths)
+
+        colors = [f"C{index % 10}" for index in range(len(labels))]
+        self.colors = [tuple(int(channel * 255) for channel in to_rgb(color)) for color in colors]
+
+        handles = [Line2D([], [], color=color, linewidth=width) for color, width in zip(colors, self.widths)]
+
+        # The legend only names the series, so it is drawn once into the background together with the axes.
+        self.axes.legend(handles, labels, loc="upper left", fontsize="x-small", ncol=math.ceil(len(labels) / 16))
+
+        self._background = None
+
+    def update(self, values: numpy.ndarray):
+        if values.ndim == 1:
+            values = values[:, None]
+
+        count = min(len(values), self.points)
+
+        if self.autoscale:
+            self._scale(float(values[-count:].max()) if count else 0.0)
+
+        if self._background is None:
+            self._draw_background()
+
+        left, top, plot_width, plot_height = self._plot_area
+        points = self._points[:count]
+
+        self.surface.blit(self._background, (0, 0))
+        self.surface.set_clip(pygame.Rect(self._plot_area))
+
+        # The series are plain polylines on top of the cached background, matplotlib only draws the axes.
+        for series in range(min(values.shape[1], len(self.colors))):
+            points[:, 1] = top + plot_height - numpy.clip(values[-count:, series], 0, self.y_limit) * (
+                plot_height / self.y_limit
+            )
+
+            if count > 1:
+                pygame.draw.lines(self.surface, self.colors[series], False, points.tolist(), self.widths[series])
+
+        self.surface.set_clip(None)
+
+    def _scale(self, peak: float):
+        # The background is only redrawn when the peak leaves the axis or drops well below it.
+        if peak <= self.y_limit and peak >= self.y_limit / 4:
+            return
+
+        y_limit = nice_limit(peak)
+
+        if y_limit != self.y_limit:
+            self.y_limit = y_limit
+            self.axes.set_ylim(0, y_limit)
+            self._background = None
+
+    def _draw_background(self):
+        self._background = self.bridge.draw()
+
+        size = self._background.get_size()
+
+        if self.surface is None or self.surface.get_size() != size:
+            self.surface = pygame.Surface(size, 0, self._background)
+
+        # Matplotlib measures from the bottom left corner and pygame from the top left.
+        x0, y0, x1, y1 = self.axes.bbox.extents
+        self._plot_area = (x0, size[1] - y1, x1 - x0, y1 - y0)
+
+        self._points = numpy.empty((self.points, 2))
+        self._points[:, 0] = x0 + numpy.arange(self.points) * ((x1 - x0) / max(self.points - 1, 1))
+
+
+class Heatmap(object):
+    def __init__(self, points: int, size: tuple = (525, 300), maximum: float = 100, colormap=cm.inferno):
+        self.points = points
+        self.size = size
+        self.maximum = maximum
+
+        self.rows = 0
+        self.surface = pygame.Surface(size)
+
+        self._palette = (colormap(numpy.linspace(0, 1, 256))[:, :3] * 255).astype(numpy.uint8)
+        self._image = None
+        self._column = None
+
+    def set_rows(self, rows: int):
+        if rows == self.rows:
+            return
+
+        self.rows = rows
+
+        # One pixel per sample and core, the scaling to the final size happens in a single blit.
+        self._image = pygame.Surface((self.points, rows))
+        self._image.fill(self._palette[0])
+        self._column = pygame.Surface((1, rows))
+
+    def load(self, values: numpy.ndarray):
+        count = min(len(values), self.points)
+
+        self._image.fill(self._palette[0])
+
+        if count:
+            block = pygame.Surface((count, self.rows))
+            pygame.surfarray.blit_array(block, self._colorize(values[-count:]))
+            self._image.blit(block, (self.points - count, 0))
+
+        self._draw()
+
+    def push(self, values):
+        # Only the newest column is colored, the rest of the image just moves one pixel to the left.
+        pygame.surfarray.blit_array(self._column, self._colorize(values)[None])
+
+        self._image.scroll(-1, 0)
+        self._image.blit(self._column, (self.points - 1, 0))
+
+        self._draw()
+
+    def _colorize(self, values) -> numpy.ndarray:
+        indices = numpy.clip(numpy.asarray(values) * (255 / self.maximum), 0, 255).astype(numpy.uint8)
+
+        return self._palette[indices]
+
+    def _draw(self):
+        pygame.transform.scale(self._image, self.size, self.surface)
@@ -1,19 +1,26 @@
-import pickle
-import pylab
+import itertools
 import select
 import socket
 import sys
 import threading
 import time
-import uuid
+import traceback
+from concurrent.futures import Future
 from queue import Queue
 
 import matplotlib
+import numpy
 import pygame
 import pygame_gui
 import pygame_menu
-from matplotlib.backends import backend_agg
-from matplotlib.ticker import FuncFormatter
+
+from charts import Heatmap, LineChart
+from protocol import (
+    BATCH, ERROR, PUSH, REQUEST, RESPONSE, SUBSCRIBE, UNSUBSCRIBE, ConnectionClosed, FrameReader, ProtocolError,
+    RequestError
+)
+from serialization import MessageCodec
+from timeseries import TimeSeriesStore
 
 pygame.init()
 
@@ -22,109 +29,284 @@ matplotlib.use("Agg")
 width = 900
 height = 600
 
-
-def run_in_thread(function):
-
-    def run(*args, **kwargs):
-        thread = threading.Thread(target=function, daemon=True, args=args, kwargs=kwargs)
-        thread.start()
-
-        return thread
-
-    return run
+history_depth = 3600
+graph_points = 60
+heatmap_cores = 8
 
 
 class SocketManager(object):
-    def __init__(self):
+    def __init__(self, timeout: float = 10.0):
         self._socket_object = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
+        self.timeout = timeout
+
         self.queue_inputs = Queue()
-        self.outputs = {}
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+        self._subscriptions = {}
 
-        self.lock_outputs = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._codec = MessageCodec()
 
-        self._loop_thread = None
+        self._reader_thread = None
+        self._writer_thread = None
         self._loop_running = True
+        self._closed = False
 
     def connect(self, host: str, port: int):
         self._socket_object.connect((host, port))
 
-        self._loop_thread = threading.Thread(target=self._loop, daemon=True)
-        self._loop_thread.start()
+        self._reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader_thread.start()
 
-    @run_in_thread
-    def update_data(self, command, update_function):
-        request_uuid = str(uuid.uuid4())
-        self.queue_inputs.put({"uuid": request_uuid, "data": command})
+        self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer_thread.start()
 
-        while True:
-            with self.lock_outputs:
-                if request_uuid in self.outputs.keys():
-                    data = self.outputs[request_uuid]
-                    self.outputs.pop(request_uuid)
+    def request(self, command, params: dict = None, timeout: float = None) -> Future:
+        message = {"data": command}
 
-                    break
+        if params is not None:
+            message["params"] = params
 
-        update_function(data)
+        return self._send(REQUEST, message, timeout)
 
-    def _loop(self):
-        while self._loop_running:
-            available_sockets = select.select([self._socket_object], [self._socket_object], [])
+    def request_batch(self, requests: list, timeout: float = None) -> Future:
+        return self._send(BATCH, {"requests": requests}, timeout)
+
+    def _send(self, message_type: int, message: dict, timeout: float = None) -> Future:
+        request_id = next(self._request_ids)
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+
+        future = Future()
+        future.add_done_callback(lambda _: self._discard(request_id))
+
+        with self._pending_lock:
+            closed = self._closed
+
+            if not closed:
+                self._pending[request_id] = (future, deadline)
+
+        # Once the reader is gone nothing would ever answer or expire the request.
+        if closed:
+            future.set_exception(ConnectionClosed("Connection closed"))
+            return future
+
+        self.queue_inputs.put((message_type, request_id, message))
+
+        return future
+
+    def update_data(self, command, update_function, params: dict = None, timeout: float = None) -> Future:
+        def on_done(future):
+            if future.cancelled():
+                return
+
+            if future.exception() is not None:
+                print(f"Falha ao obter {command}: {future.exception()}")
+                return
+
+            update_function(future.result())
+
+        future = self.request(command, params, timeout)
+        future.add_done_callback(on_done)
+
+        return future
+
+    def subscribe(self, command, interval: float, update_function, params: dict = None) -> int:
+        subscription_id = next(self._request_ids)
+        self._subscriptions[subscription_id] = (command, update_function)
+
+        message = {"data": command, "interval": interval}
+
+        if params is not None:
+            message["params"] = params
+
+        self.queue_inputs.put((SUBSCRIBE, subscription_id, message))
+
+        return subscription_id
+
+    def unsubscribe(self, subscription_id: int):
+        if self._subscriptions.pop(subscription_id, None) is not None:
+            self.queue_inputs.put((UNSUBSCRIBE, subscription_id, {}))
+
+    def _discard(self, request_id: int):
+        with self._pending_lock:
+            self._pending.pop(request_id, None)
+
+    def _resolve(self, request_id: int, result=None, exception: Exception = None):
+        with self._pending_lock:
+            future, _ = self._pending.pop(request_id, (None, None))
+
+        if future is None or not future.set_running_or_notify_cancel():
+            return
+
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def _expire_requests(self):
+        now = time.monotonic()
+
+        with self._pending_lock:
+            expired = [request_id for request_id, (_, deadline) in self._pending.items() if deadline <= now]
 
-            if available_sockets[0]:
-                data_fragments = []
+        for request_id in expired:
+            self._resolve(request_id, exception=TimeoutError(f"Request {request_id} timed out"))
 
-                complete_data = False
+    def _dispatch(self, subscription_id: int, data):
+        subscription = self._subscriptions.get(subscription_id)
 
-                while not complete_data:
-                    received_data = self._socket_object.recv(1024)
+        # Pushes can still be in flight right after unsubscribing.
+        if subscription is None:
+            return
 
+        try:
+            subscription[1](data)
+        except Exception:
+            traceback.print_exc()
+
+    def _read_loop(self):
+        frame_reader = FrameReader(self._socket_object)
+
+        while self._loop_running:
+            # Blocks until the server sends something, waking up once a second only to expire requests.
+            readable, _, _ = select.select([self._socket_object], [], [], 1.0)
+
+            if readable:
+                try:
+                    frames = frame_reader.read_frames()
+                except (OSError, ProtocolError):
+                    break
+
+                for frame in frames:
+                    # A frame that fails to decode is lost on its own, the reader keeps serving the others.
                     try:
-                        formated_data = pickle.loads(received_data)
+                        self._handle_frame(frame)
+                    except Exception:
+                        traceback.print_exc()
+
+            self._expire_requests()
+
+        with self._pending_lock:
+            self._closed = True
+            pending = list(self._pending.keys())
+
+        for request_id in pending:
+            self._resolve(request_id, exception=ConnectionClosed("Connection closed"))
 
-                        with self.lock_outputs:
-                            self.outputs[formated_data["uuid"]] = formated_data["data"]
+    def _handle_frame(self, frame):
+        data = self._codec.decode(frame)
 
-                        complete_data = True
-                    except:
-                        data_fragments.append(received_data)
+        if frame.message_type == RESPONSE:
+            self._resolve(frame.request_id, result=data)
+        elif frame.message_type == PUSH:
+            self._dispatch(frame.request_id, data)
+        elif frame.message_type == ERROR and frame.request_id in self._subscriptions:
+            print(f"Falha ao obter {self._subscriptions[frame.request_id][0]}: {data['error']}")
+        elif frame.message_type == ERROR:
+            self._resolve(frame.request_id, exception=RequestError(data["error"]))
 
-                        try:
-                            formated_data = pickle.loads(b"".join(data_fragments))
+    def _write_loop(self):
+        while True:
+            message = self.queue_inputs.get()
 
-                            with self.lock_outputs:
-                                self.outputs[formated_data["uuid"]] = formated_data["data"]
+            if message is None:
+                break
 
-                            complete_data = True
-                        except:
-                            pass
+            message_type, request_id, command = message
 
-            elif available_sockets[1] and not self.queue_inputs.empty():
-                self._socket_object.send(pickle.dumps(self.queue_inputs.get()))
+            try:
+                self._socket_object.sendall(self._codec.encode(message_type, request_id, command))
+            except OSError:
+                break
 
     def close(self):
         self._loop_running = False
-        self._loop_thread.join()
+        self.queue_inputs.put(None)
+
+        try:
+            self._socket_object.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        for thread in (self._reader_thread, self._writer_thread):
+            if thread is not None:
+                thread.join()
+
         self._socket_object.close()
 
 
+class RefreshScheduler(object):
+    retry_interval = 5
+
+    def __init__(self):
+        self._refreshed_at = {}
+        self._in_flight = {}
+
+    def poll(self, page):
+        future = self._in_flight.get(page.name)
+
+        # A refresh that is still waiting for its answer is never sent twice.
+        if future is not None and not future.done():
+            return
+
+        now = time.monotonic()
+        refreshed_at = self._refreshed_at.get(page.name)
+
+        if future is not None and (future.cancelled() or future.exception() is not None):
+            interval = self.retry_interval
+        else:
+            interval = page.refresh_interval
+
+        if refreshed_at is not None and (interval is None or now - refreshed_at < interval):
+            return
+
+        future = page.get_new_data()
+
+        if future is not None:
+            self._refreshed_at[page.name] = now
+            self._in_flight[page.name] = future
+
+
 class ScreenManager(object):
     def __init__(self):
         self.screen = pygame.display.set_mode((width, height))
         self._pages = {}
         self.current_page = None
         self.clock = pygame.time.Clock()
+        self.refresh_scheduler = RefreshScheduler()
 
     def add_page(self, page):
         self._pages[page.name] = page
 
+    def show(self, page_name: str):
+        if page_name == self.current_page:
+            return
+
+        if self.current_page is not None:
+            self._pages[self.current_page].on_hide()
+
+        self.current_page = page_name
+        self._pages[page_name].on_show()
+
     def show_current_page(self):
         page = self._pages[self.current_page]
 
+        self.refresh_scheduler.poll(page)
         page.render()
 
+    def process_events(self, event):
+        page = self._pages[self.current_page]
+
+        page.process_events(event)
+        page.handle_event(event)
+
 
 class Page(pygame_gui.UIManager):
+    subscription_interval = None
+    refresh_interval = None
+
     def __init__(
         self, 
         name: str, 
@@ -140,13 +322,27 @@ class Page(pygame_gui.UIManager):
         self.data = None
         self.data_lock = threading.Lock()
 
+        self._subscription_id = None
+
         self._screen_manager.add_page(self)
 
+    def on_show(self):
+        if self.subscription_interval is not None:
+            self._subscription_id = self._socket_manager.subscribe(self.name, self.subscription_interval, self.set_data)
+
+    def on_hide(self):
+        if self._subscription_id is not None:
+            self._socket_manager.unsubscribe(self._subscription_id)
+            self._subscription_id = None
+
     def get_new_data(self):
-        self.get_data_from_socket()
+        if self.subscription_interval is None:
+            return self.get_data_from_socket()
 
-    def get_data_from_socket(self):
-        self._socket_manager.update_data(self.name, self.set_data)
+        return None
+
+    def get_data_from_socket(self) -> Future:
+        return self._socket_manager.update_data(self.name, self.set_data)
 
     def set_data(self, new_data):
         self.data = new_data
@@ -155,8 +351,14 @@ class Page(pygame_gui.UIManager):
     def update_screen(self):
         print(self.data)
 
+    def set_lines(self, labels: list, lines: list):
+        for index, label in enumerate(labels):
+            label.set_text(lines[index] if index < len(lines) else "")
+
+    def handle_event(self, event):
+        pass
+
     def render(self):
-        self.get_new_data()
         time_delta = self._screen_manager.clock.tick(30) / 1000.0
         self.update(time_delta)
         self.draw_ui(self._screen_manager.screen)
@@ -260,29 +462,21 @@ class SystemPage(Page):
 
 
 class CpuPage(Page):
+    subscription_interval = 4
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.data = {
-            "usage": [], 
-            "cores_usage": {}
-        }
+        self.data = {}
+        self.history = TimeSeriesStore(history_depth)
 
-        self._initialized = False
+        self.static_version = None
 
-        self.usage_graph_fig = pylab.figure(figsize=[7, 4], dpi=75)
-        self.usage_graph = self.usage_graph_fig.gca()
+        self.usage_chart = LineChart(graph_points, formatter=lambda y, _: f"{y}%")
+        self.usage_heatmap = Heatmap(graph_points)
 
-        self.usage_graph.set_ylim(0, 100)
-        self.usage_graph.set_xlim(1, 10)
-
-        self.usage_graph.yaxis.set_major_formatter(FuncFormatter(lambda y, _: f"{y}%"))
-
-        self.canvas = backend_agg.FigureCanvasAgg(self.usage_graph_fig)
-        self.usage_graph_renderer = self.canvas.get_renderer()
-        self.usage_graph_surf = None
-
-        self.colors = [None, None, None]
+        # None picks the heatmap by itself once there are too many cores for one line each.
+        self.heatmap = None
 
         self.name_label = pygame_gui.elements.UILabel(
             relative_rect=pygame.Rect((150, 10), (600, 50)),
@@ -324,120 +518,113 @@ class CpuPage(Page):
             text="",
             manager=self,
         )
+        self.usage_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, 480), (250, 50)),
+            text="",
+            manager=self,
+        )
+        self.mode_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((300, 460), (225, 30)),
+            text="Mapa de calor",
+            manager=self,
+        )
 
-    def init(self):
-        if not self._initialized:
-            self.get_new_data_loop()
-
-        self._initialized = True
-
-    @run_in_thread
-    def get_new_data_loop(self):
-        while True:
-            self.get_new_data()
-            time.sleep(4)
-
-    def set_data(self, new_data):
+    def set_static_data(self, static_data):
         with self.data_lock:
-            self.data["usage"].append(new_data["usage"])
-
-            if len(self.data["usage"]) > 10:
-                self.data["usage"] = self.data["usage"][1:]
-
-            for core in range(new_data["cores_number"]):
-                if core not in self.data["cores_usage"].keys():
-                    self.data["cores_usage"][core] = []
-
-                self.data["cores_usage"][core].append(new_data["cores_usage"][core])
-
-                if len(self.data["cores_usage"][core]) > 10:
-                    self.data["cores_usage"][core] = self.data["cores_usage"][core][1:]
-
-            new_data.pop("usage")
-            new_data.pop("cores_usage")
-
-            self.data = {**self.data, **new_data}
+            self.static_version = static_data["version"]
+            self.data = {**self.data, **static_data["cpu"]}
 
             self.name_label.set_text(f"Modelo: {self.data['name']}")
             self.architecture_label.set_text(f"Arquitetura: {self.data['architecture']}")
             self.bits_label.set_text(f"Bits: {self.data['bits']}")
             self.min_frequency_label.set_text(f"Frequência mínima: {self.data['min_frequency']}hz")
             self.max_frequency_label.set_text(f"Frequência máxima: {self.data['max_frequency']}hz")
-            self.current_frequency_label.set_text(f"Frequência atual: {self.data['current_frequency']}hz")
             self.physical_cores_number_label.set_text(f"Núcleos (físicos): {self.data['physical_cores_number']}")
             self.cores_number_label.set_text(f"Núcleos: {self.data['cores_number']}")
 
-        self.update_screen()
+    def set_data(self, new_data):
+        if new_data["static_version"] != self.static_version:
+            self._socket_manager.update_data("static", self.set_static_data)
 
-    def update_screen(self):
         with self.data_lock:
-            for line in self.usage_graph.get_lines():
-                color = line.get_color()
+            self.history.append("usage", new_data["usage"])
+            self.history.append("cores_usage", new_data["cores_usage"])
 
-                if None in self.colors:
-                    self.colors.remove(None)
+            self.data["current_frequency"] = new_data["current_frequency"]
 
-                if color in self.colors:
-                    self.colors.remove(color)
+            self.current_frequency_label.set_text(f"Frequência atual: {self.data['current_frequency']}hz")
+            self.usage_label.set_text(f"Uso: {new_data['usage']:.1f}%")
 
-                self.colors.append(color)
+            cores = len(new_data["cores_usage"])
 
-                line.remove()
+            if self.usage_heatmap.rows != cores:
+                self.usage_heatmap.set_rows(cores)
+                self.usage_heatmap.load(self.history.window("cores_usage", graph_points))
+            else:
+                self.usage_heatmap.push(new_data["cores_usage"])
 
-            plot_args = [range(1, len(self.data["usage"]) + 1),  self.data["usage"]]
-            if self.colors[0] is not None:
-                plot_args.append(self.colors[0])
+        self.update_screen()
 
-            self.usage_graph.plot(*plot_args, label=f"Geral ({self.data['usage'][-1]})%")
+    def show_heatmap(self) -> bool:
+        if self.heatmap is None:
+            return self.usage_heatmap.rows > heatmap_cores
 
-        count = 1
-        for core in self.data["cores_usage"].values():
-            plot_args = [range(1, len(core) + 1), core]
-            if self.colors[count] is not None:
-                plot_args.append(self.colors[count])
+        return self.heatmap
 
-            self.usage_graph.plot(*plot_args, label=f"Núcleo {count} ({core[-1]}%)")
-            count += 1
+    def update_screen(self):
+        with self.data_lock:
+            heatmap = self.show_heatmap()
+            self.mode_button.set_text("Gráfico de linhas" if heatmap else "Mapa de calor")
 
-        self.canvas.draw()
-        self.usage_graph_raw_data = self.usage_graph_renderer.tostring_rgb()
-        self.usage_graph_size = self.canvas.get_width_height()
-        self.usage_graph_surf = pygame.image.fromstring(self.usage_graph_raw_data, self.usage_graph_size, "RGB")
+            # The heatmap already got its column in set_data.
+            if heatmap:
+                return
+
+            # The per-core series starts over when the number of cores changes, the overall one does not.
+            count = min(graph_points, self.history.length("cores_usage"))
+
+            usage = self.history.window("usage", count)
+            cores_usage = self.history.window("cores_usage", count)
+
+            cores = cores_usage.shape[1]
+            self.usage_chart.set_series(
+                ["Geral"] + [f"Núcleo {core + 1}" for core in range(cores)], [2] + [1] * cores
+            )
 
-        self.usage_graph.legend()
+            self.usage_chart.update(numpy.column_stack([usage, cores_usage]))
+
+    def handle_event(self, event):
+        if event.type != pygame.USEREVENT:
+            return
+
+        if event.user_type == pygame_gui.UI_BUTTON_PRESSED and event.ui_element == self.mode_button:
+            if self.usage_heatmap.rows:
+                self.heatmap = not self.show_heatmap()
+                self.update_screen()
 
     def render(self):
-        if self.usage_graph_surf is not None:
+        surface = self.usage_heatmap.surface if self.show_heatmap() else self.usage_chart.surface
+
+        if surface is not None and self.usage_heatmap.rows:
             time_delta = self._screen_manager.clock.tick(30) / 1000.0
             self.update(time_delta)
 
-            self._screen_manager.screen.blit(self.usage_graph_surf, (300, 150))
+            self._screen_manager.screen.blit(surface, (300, 150))
 
             self.draw_ui(self._screen_manager.screen)
 
 
 class RamPage(Page):
+    subscription_interval = 4
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.data = {"percent_usage": []}
-
-        self._initialized = False
-
-        self.usage_graph_fig = pylab.figure(figsize=[7, 4], dpi=75)
-        self.usage_graph = self.usage_graph_fig.gca()
-
-        self.usage_graph.set_ylim(0, 100)
-        self.usage_graph.set_xlim(1, 10)
-
-        self.usage_graph.yaxis.set_major_formatter(FuncFormatter(lambda y, _: f"{y}%"))
-
-        self.canvas = backend_agg.FigureCanvasAgg(self.usage_graph_fig)
-        self.usage_graph_renderer = self.canvas.get_renderer()
+        self.data = {}
+        self.history = TimeSeriesStore(history_depth)
 
-        self.usage_graph_surf = None
-
-        self.color = None
+        self.usage_chart = LineChart(graph_points, formatter=lambda y, _: f"{y}%")
+        self.usage_chart.set_series(["Uso"], [2])
 
         self.total_gb_label = pygame_gui.elements.UILabel(
             relative_rect=pygame.Rect((10, 200), (300, 50)),
@@ -455,129 +642,525 @@ class RamPage(Page):
             manager=self
         )
 
-    def init(self):
-        if not self._initialized:
-            self.get_new_data_loop()
+    def set_data(self, new_data):
+        with self.data_lock:
+            self.history.append("percent_usage", new_data["percent_usage"])
+            self.data = new_data
 
-        self._initialized = True
+        self.update_screen()
 
-    @run_in_thread
-    def get_new_data_loop(self):
-        while True:
-            self.get_new_data()
-            time.sleep(4)
+    def update_screen(self):
+        with self.data_lock:
+            self.usage_chart.update(self.history.window("percent_usage", graph_points))
+
+            self.total_gb_label.set_text(f"Total: {self.data['total_gb']}gb")
+            self.used_gb_label.set_text(f"Usado: {self.data['used_gb']}gb ({self.data['percent_usage']:.1f}%)")
+            self.available_gb_label.set_text(f"Disponível: {self.data['available_gb']}gb")
+
+    def render(self):
+        if self.usage_chart.surface is not None:
+            time_delta = self._screen_manager.clock.tick(30) / 1000.0
+            self.update(time_delta)
+
+            self._screen_manager.screen.blit(self.usage_chart.surface, (300, 130))
+
+            self.draw_ui(self._screen_manager.screen)
+
+
+class DiskPage(Page):
+    subscription_interval = 1
+    partition_rows = 4
+    device_rows = 5
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.history = TimeSeriesStore(history_depth)
+
+        self.throughput_chart = LineChart(
+            graph_points, figsize=[7, 3.5], formatter=lambda y, _: f"{y:g} MB/s", autoscale=True
+        )
+        self.throughput_chart.set_series(["Leitura", "Escrita"], [2, 2])
+
+        self.iops_chart = LineChart(graph_points, figsize=[7, 3.5], formatter=lambda y, _: f"{y:g}", autoscale=True)
+        self.iops_chart.set_series(["Leituras/s", "Escritas/s"], [2, 2])
+
+        self.partitions_title = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, 10), (330, 30)),
+            text="Partições",
+            manager=self
+        )
+        self.partition_labels = [
+            pygame_gui.elements.UILabel(
+                relative_rect=pygame.Rect((10, 40 + line * 25), (330, 25)),
+                text="",
+                manager=self
+            )
+            for line in range(self.partition_rows * 2)
+        ]
+
+        self.devices_title = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, 250), (330, 30)),
+            text="Dispositivos",
+            manager=self
+        )
+        self.device_labels = [
+            pygame_gui.elements.UILabel(
+                relative_rect=pygame.Rect((10, 280 + line * 25), (330, 25)),
+                text="",
+                manager=self
+            )
+            for line in range(self.device_rows * 2)
+        ]
 
     def set_data(self, new_data):
         with self.data_lock:
-            self.data["percent_usage"].append(new_data["percent_usage"])
+            self.history.append("read_mb", new_data["read_bytes_per_second"] / 1024 / 1024)
+            self.history.append("write_mb", new_data["write_bytes_per_second"] / 1024 / 1024)
+            self.history.append("read_iops", new_data["read_iops"])
+            self.history.append("write_iops", new_data["write_iops"])
 
-            if len(self.data["percent_usage"]) > 10:
-                self.data["percent_usage"] = self.data["percent_usage"][1:]
-
-            self.data = {**new_data, **self.data}
+            self.data = new_data
 
         self.update_screen()
 
     def update_screen(self):
         with self.data_lock:
-            for line in self.usage_graph.get_lines():
-                self.color = line.get_color()
-                line.remove()
+            self.throughput_chart.update(numpy.column_stack([
+                self.history.window("read_mb", graph_points),
+                self.history.window("write_mb", graph_points),
+            ]))
+            self.iops_chart.update(numpy.column_stack([
+                self.history.window("read_iops", graph_points),
+                self.history.window("write_iops", graph_points),
+            ]))
+
+            lines = []
+
+            for partition in self.data["partitions"][:self.partition_rows]:
+                lines.append(f"{partition['mountpoint']} ({partition['fstype']})")
+                lines.append(
+                    f"  {partition['used_gb']}gb de {partition['total_gb']}gb ({partition['used_percent']}%)"
+                )
+
+            self.set_lines(self.partition_labels, lines)
+
+            # The busiest devices come first, idle loop devices would otherwise take all the rows.
+            devices = sorted(
+                self.data["devices"],
+                key=lambda device: device["read_bytes_per_second"] + device["write_bytes_per_second"],
+                reverse=True,
+            )
 
-            plot_args = [range(1, len(self.data["percent_usage"]) + 1),  self.data["percent_usage"]]
-            if self.color is not None:
-                plot_args.append(self.color)
+            lines = []
 
-            self.usage_graph.plot(*plot_args, label=f"Uso ({self.data['percent_usage'][-1]})%")
+            for device in devices[:self.device_rows]:
+                lines.append(
+                    f"{device['device']}: leitura {device['read_bytes_per_second'] / 1024 / 1024:.2f} MB/s, "
+                    f"escrita {device['write_bytes_per_second'] / 1024 / 1024:.2f} MB/s"
+                )
+                lines.append(f"  {device['read_iops']:.0f} leituras/s, {device['write_iops']:.0f} escritas/s")
 
-            self.total_gb_label.set_text(f"Total: {self.data['total_gb']}gb")
-            self.used_gb_label.set_text(f"Usado: {self.data['used_gb']}gb")
-            self.available_gb_label.set_text(f"Disponível: {self.data['available_gb']}gb")
+            self.set_lines(self.device_labels, lines)
 
-        self.canvas.draw()
-        usage_graph_raw_data = self.usage_graph_renderer.tostring_rgb()
-        usage_graph_size = self.canvas.get_width_height()
-        self.usage_graph_surf = pygame.image.fromstring(usage_graph_raw_data, usage_graph_size, "RGB")
+    def render(self):
+        time_delta = self._screen_manager.clock.tick(30) / 1000.0
+        self.update(time_delta)
 
-        self.usage_graph.legend()
+        # Both charts are drawn on the reader thread one after the other, a frame can land in between.
+        if self.throughput_chart.surface is not None:
+            self._screen_manager.screen.blit(self.throughput_chart.surface, (345, 10))
 
-    def render(self):
-        if self.usage_graph_surf is not None:
-            time_delta = self._screen_manager.clock.tick(30) / 1000.0
-            self.update(time_delta)
+        if self.iops_chart.surface is not None:
+            self._screen_manager.screen.blit(self.iops_chart.surface, (345, 280))
 
-            self._screen_manager.screen.blit(self.usage_graph_surf, (300, 130))
+        self.draw_ui(self._screen_manager.screen)
 
-            self.draw_ui(self._screen_manager.screen)
 
+class NetworkPage(Page):
+    subscription_interval = 2
+    interface_rows = 6
+    host_rows = 8
 
-class DiskPage(Page):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.total_label = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((300, 225), (300, 50)),
-            text="",
+        self.history = TimeSeriesStore(history_depth)
+        self.interfaces = set()
+        self.interface_index = 0
+
+        self.traffic_chart = LineChart(graph_points, formatter=lambda y, _: f"{y:g} KB/s", autoscale=True)
+        self.traffic_chart.set_series(["Recebido", "Enviado"], [2, 2])
+
+        self.interfaces_title = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, 10), (330, 30)),
+            text="Interfaces",
             manager=self
         )
-        self.used_label = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((300, 275), (300, 50)),
-            text="",
+        self.interface_labels = [
+            pygame_gui.elements.UILabel(
+                relative_rect=pygame.Rect((10, 40 + row * 25), (330, 25)),
+                text="",
+                manager=self
+            )
+            for row in range(self.interface_rows)
+        ]
+
+        self.hosts_title = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, 200), (330, 30)),
+            text="Hosts",
             manager=self
         )
-        self.available_label = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((300, 325), (300, 50)),
+        self.host_labels = [
+            pygame_gui.elements.UILabel(
+                relative_rect=pygame.Rect((10, 230 + row * 25), (330, 25)),
+                text="",
+                manager=self
+            )
+            for row in range(self.host_rows)
+        ]
+        self.scan_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, 440), (330, 25)),
             text="",
             manager=self
         )
 
-    def get_data(self):
-        if self.data is not None:
-            self.get_data_from_socket()
+        self.previous_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((345, 10), (50, 30)),
+            text="<",
+            manager=self,
+        )
+        self.interface_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((395, 10), (425, 30)),
+            text="",
+            manager=self,
+        )
+        self.next_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((820, 10), (50, 30)),
+            text=">",
+            manager=self,
+        )
+        self.packets_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((345, 360), (525, 30)),
+            text="",
+            manager=self,
+        )
+        self.errors_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((345, 390), (525, 30)),
+            text="",
+            manager=self,
+        )
+
+    def set_data(self, new_data):
+        with self.data_lock:
+            interfaces = set()
+
+            for traffic in new_data["traffic"]:
+                interface = traffic["interface"]
+                interfaces.add(interface)
+
+                self.history.append(f"{interface}.received", traffic["bytes_received_per_second"] / 1024)
+                self.history.append(f"{interface}.sent", traffic["bytes_sent_per_second"] / 1024)
+
+            # Interfaces come and go on hosts running containers, a vanished one takes its history with it.
+            for interface in self.interfaces - interfaces:
+                self.history.remove(f"{interface}.received")
+                self.history.remove(f"{interface}.sent")
+
+            self.interfaces = interfaces
+            self.data = new_data
+
+        self.update_screen()
 
     def update_screen(self):
         with self.data_lock:
-            self.total_label.set_text(f"Total: {self.data['gize_gb']}gb")
-            self.used_label.set_text(
-                f"Usado: {self.data['used_gb']}gb ({self.data['used_percent']}%)"
+            if self.data is None:
+                return
+
+            self.set_lines(self.interface_labels, [
+                f"{interface['interface']}: {interface['address']} ({interface['netmask']})"
+                for interface in self.data["interfaces"]
+            ])
+
+            hosts = []
+
+            for host in self.data["hosts"]:
+                ports = [str(port["port"]) for protocol in host["protocols"] for port in protocol["ports"]]
+                name = f" ({host['name']})" if host["name"] else ""
+
+                hosts.append(f"{host['host']}{name}: {', '.join(ports) or 'nenhuma porta aberta'}")
+
+            self.set_lines(self.host_labels, hosts)
+
+            scan = self.data["scan"]
+
+            if scan["error"] is not None:
+                self.scan_label.set_text(f"Falha na varredura: {scan['error']}")
+            elif scan["age"] is None:
+                self.scan_label.set_text("Varredura em andamento")
+            else:
+                self.scan_label.set_text(f"Última varredura há {scan['age']:.0f}s")
+
+            traffic = self.data["traffic"]
+
+            if not traffic:
+                return
+
+            selected = traffic[self.interface_index % len(traffic)]
+            interface = selected["interface"]
+
+            self.interface_label.set_text(f"Interface: {interface}")
+            self.packets_label.set_text(
+                f"Pacotes: {selected['packets_received_per_second']:.0f} recebidos/s, "
+                f"{selected['packets_sent_per_second']:.0f} enviados/s"
             )
-            self.available_label.set_text(
-                f"Disponível: {self.data['available_gb']}gb ({self.data['available_percent']}%)"
+            self.errors_label.set_text(
+                f"Erros: {selected['errors_in_per_second']:.0f} na entrada/s, "
+                f"{selected['errors_out_per_second']:.0f} na saída/s"
             )
 
+            if f"{interface}.received" in self.history:
+                self.traffic_chart.update(numpy.column_stack([
+                    self.history.window(f"{interface}.received", graph_points),
+                    self.history.window(f"{interface}.sent", graph_points),
+                ]))
+
+    def handle_event(self, event):
+        if event.type != pygame.USEREVENT:
+            return
+
+        if event.user_type == pygame_gui.UI_BUTTON_PRESSED:
+            if event.ui_element == self.previous_button:
+                self.interface_index -= 1
+                self.update_screen()
+
+            if event.ui_element == self.next_button:
+                self.interface_index += 1
+                self.update_screen()
+
+    def render(self):
+        time_delta = self._screen_manager.clock.tick(30) / 1000.0
+        self.update(time_delta)
+
+        if self.traffic_chart.surface is not None:
+            self._screen_manager.screen.blit(self.traffic_chart.surface, (345, 50))
+
+        self.draw_ui(self._screen_manager.screen)
+
+
+class ProcessTable(object):
+    def __init__(self):
+        self.sequence = None
+        self.processes = {}
+
+    def apply(self, update: dict) -> bool:
+        if update["full"]:
+            self.processes = {process["pid"]: process for process in update["processes"]}
+        elif self.sequence is not None and update["sequence"] == self.sequence + 1:
+            for pid in update["removed"]:
+                self.processes.pop(pid, None)
+
+            for process in update["added"]:
+                self.processes[process["pid"]] = process
+
+            for changed_fields in update["changed"]:
+                self.processes[changed_fields["pid"]] = {**self.processes[changed_fields["pid"]], **changed_fields}
+        else:
+            self.sequence = None
+            return False
+
+        self.sequence = update["sequence"]
+
+        return True
+
+    def rows(self) -> list:
+        return list(self.processes.values())
+
+
+class ProcessesPage(Page):
+    refresh_interval = 3
+    page_size = 18
+
+    columns = [
+        ("pid", "PID", 70),
+        ("name", "Nome", 170),
+        ("used_memory", "Memória (MB)", 110),
+        ("memory_use_percent", "Memória (%)", 100),
+        ("used_threads", "Threads", 70),
+        ("cpu_percent", "CPU (%)", 80),
+        ("cpu_time", "Tempo de CPU", 110),
+        ("created_date", "Criado em", 190),
+    ]
 
-class NetworkPage(Page):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.interfaces_labels = []
-        self.hosts_labels = []
+        self.process_table = ProcessTable()
 
-        self.data_requested = False
+        self.sort_key = "cpu_percent"
+        self.descending = True
+        self.page = 0
+        self.total = 0
+        self.name_filter = ""
+        self.min_memory = None
 
-    def get_new_data(self):
-        if not self.data_requested:
-            self.get_data_from_socket()
+        self.name_filter_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, 10), (60, 30)),
+            text="Nome:",
+            manager=self,
+        )
+        self.name_filter_entry = pygame_gui.elements.UITextEntryLine(
+            relative_rect=pygame.Rect((70, 10), (180, 30)),
+            manager=self,
+        )
+        self.min_memory_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((260, 10), (150, 30)),
+            text="Memória mín. (MB):",
+            manager=self,
+        )
+        self.min_memory_entry = pygame_gui.elements.UITextEntryLine(
+            relative_rect=pygame.Rect((410, 10), (100, 30)),
+            manager=self,
+        )
+        self.previous_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((600, 10), (50, 30)),
+            text="<",
+            manager=self,
+        )
+        self.page_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((650, 10), (190, 30)),
+            text="",
+            manager=self,
+        )
+        self.next_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((840, 10), (50, 30)),
+            text=">",
+            manager=self,
+        )
 
-        self.data_requested = True
+        self.header_buttons = {}
+        self.cell_labels = []
 
-    def update_screen(self):
-        self.interfaces_labels = []
-        self.hosts_labels = []
+        x = 0
+        for key, title, column_width in self.columns:
+            self.header_buttons[key] = pygame_gui.elements.UIButton(
+                relative_rect=pygame.Rect((x, 50), (column_width, 30)),
+                text=title,
+                manager=self,
+            )
 
-        with self.data_lock:
-            count = 1
-            for interface in self.data["interfaces"]:
-                self.interfaces_labels.append(pygame_gui.elements.UILabel(
-                    relative_rect=pygame.Rect(0, count * 50),
-                    text=f"{interface['name']}:\n Endereço: {interface['address']}\n netmask: {interface['netmask']}",
-                    manager=self
+            x += column_width
+
+        for row in range(self.page_size):
+            x = 0
+            row_labels = []
+
+            for key, _, column_width in self.columns:
+                row_labels.append(pygame_gui.elements.UILabel(
+                    relative_rect=pygame.Rect((x, 85 + row * 25), (column_width, 25)),
+                    text="",
+                    manager=self,
                 ))
-                count += 1
 
+                x += column_width
 
-class ProcessesPage(Page):
-    pass
+            self.cell_labels.append(row_labels)
+
+    def query(self) -> dict:
+        query = {
+            "sort": self.sort_key,
+            "descending": self.descending,
+            "limit": self.page_size,
+            "offset": self.page * self.page_size,
+        }
+
+        if self.name_filter:
+            query["name"] = self.name_filter
+
+        if self.min_memory is not None:
+            query["min_memory"] = self.min_memory
+
+        return query
+
+    def change_query(self, **changes):
+        for attribute, value in changes.items():
+            setattr(self, attribute, value)
+
+        self.process_table = ProcessTable()
+        self.get_data_from_socket()
+
+    def handle_event(self, event):
+        if event.type != pygame.USEREVENT:
+            return
+
+        if event.user_type == pygame_gui.UI_BUTTON_PRESSED:
+            if event.ui_element == self.previous_button and self.page > 0:
+                self.change_query(page=self.page - 1)
+
+            if event.ui_element == self.next_button and (self.page + 1) * self.page_size < self.total:
+                self.change_query(page=self.page + 1)
+
+            for key, button in self.header_buttons.items():
+                if event.ui_element == button:
+                    descending = not self.descending if key == self.sort_key else key != "name"
+                    self.change_query(sort_key=key, descending=descending, page=0)
+
+        if event.user_type == pygame_gui.UI_TEXT_ENTRY_FINISHED:
+            if event.ui_element == self.name_filter_entry:
+                self.change_query(name_filter=self.name_filter_entry.get_text().strip(), page=0)
+
+            if event.ui_element == self.min_memory_entry:
+                try:
+                    min_memory = float(self.min_memory_entry.get_text())
+                except ValueError:
+                    min_memory = None
+
+                self.change_query(min_memory=min_memory, page=0)
+
+    def get_data_from_socket(self) -> Future:
+        query = self.query()
+        process_table = self.process_table
+
+        def set_data(new_data):
+            # Answers to an older query are dropped, the table was reset when the query changed.
+            if process_table is self.process_table and query == self.query():
+                self.set_data(new_data)
+
+        return self._socket_manager.update_data(
+            self.name, set_data, params={**query, "since": self.process_table.sequence}
+        )
+
+    def set_data(self, new_data):
+        with self.data_lock:
+            applied = self.process_table.apply(new_data)
+            self.total = new_data["total"]
+            self.data = sorted(
+                self.process_table.rows(),
+                key=lambda process: process[self.sort_key],
+                reverse=self.descending,
+            )
+
+        if applied:
+            self.update_screen()
+
+    def update_screen(self):
+        with self.data_lock:
+            pages = max(1, -(-self.total // self.page_size))
+            self.page_label.set_text(f"Página {self.page + 1} de {pages} ({self.total})")
+
+            for row, row_labels in enumerate(self.cell_labels):
+                process = self.data[row] if row < len(self.data) else None
+
+                for (key, _, _), label in zip(self.columns, row_labels):
+                    if process is None:
+                        text = ""
+                    elif isinstance(process[key], float):
+                        text = f"{process[key]:.2f}"
+                    else:
+                        text = str(process[key])
+
+                    if label.text != text:
+                        label.set_text(text)
 
 
 system_page = SystemPage(
@@ -635,7 +1218,7 @@ def main():
 
     clock = screen_manager.clock
 
-    screen_manager.current_page = "system"
+    screen_manager.show("system")
 
     running = True
 
@@ -651,21 +1234,20 @@ def main():
             if event.type == pygame.USEREVENT:
                 if event.user_type == pygame_gui.UI_BUTTON_PRESSED:
                     if event.ui_element == btn_system:
-                        screen_manager.current_page = "system"
+                        screen_manager.show("system")
                     if event.ui_element == btn_cpu:
-                        cpu_page.init()
-                        screen_manager.current_page = "cpu"
+                        screen_manager.show("cpu")
                     if event.ui_element == btn_memory:
-                        ram_page.init()
-                        screen_manager.current_page = "ram"
+                        screen_manager.show("ram")
                     if event.ui_element == btn_disk:
-                        screen_manager.current_page = "disk"
+                        screen_manager.show("disk")
                     if event.ui_element == btn_network:
-                        screen_manager.current_page = "network"
+                        screen_manager.show("network")
                     if event.ui_element == btn_processes:
-                        screen_manager.current_page = "processes"
+                        screen_manager.show("processes")
 
             main_manager.process_events(event)
+            screen_manager.process_events(event)
 
         main_manager.update(time_delta)
 
@@ -0,0 +1,218 @@
+import json
+import os
+import shutil
+import threading
+from urllib.parse import quote
+
+import numpy
+
+from rollup import lttb
+
+TIME_COLUMN = "time"
+
+
+class Segment(object):
+    def __init__(self, path: str, start: float, columns: dict = None):
+        self.path = path
+        self.start = start
+
+        meta_path = os.path.join(path, "meta.json")
+
+        if columns is not None:
+            os.makedirs(path, exist_ok=True)
+
+            with open(meta_path, "w") as meta_file:
+                json.dump({"start": start, "columns": columns}, meta_file)
+
+        with open(meta_path) as meta_file:
+            self.columns = json.load(meta_file)["columns"]
+
+        self._files = {}
+
+    def column_path(self, column: str) -> str:
+        # Partition columns carry their mountpoint, the slashes cannot end up in the file name.
+        return os.path.join(self.path, f"{quote(column, safe='')}.bin")
+
+    def append(self, timestamp: float, values: dict):
+        if not self._files:
+            self._open()
+
+        # Columns are written first and the time column last, so a reader never sees a row without its values.
+        for column, (dtype, width) in self.columns.items():
+            value = values.get(column)
+            row = numpy.full(width, numpy.nan, dtype=dtype)
+
+            # A segment reopened after a restart may have been laid out for a different number of cores.
+            if value is not None and numpy.size(value) == width:
+                row[:] = value
+
+            self._files[column].write(row.tobytes())
+            self._files[column].flush()
+
+        self._files[TIME_COLUMN].write(numpy.float64(timestamp).tobytes())
+        self._files[TIME_COLUMN].flush()
+
+    def _open(self):
+        time_path = self.column_path(TIME_COLUMN)
+        rows = os.path.getsize(time_path) // 8 if os.path.exists(time_path) else 0
+
+        # A crash between writing the values and the time of a row leaves values without a time, drop them.
+        for column, (dtype, width) in self.columns.items():
+            path = self.column_path(column)
+
+            if os.path.exists(path):
+                os.truncate(path, rows * numpy.dtype(dtype).itemsize * width)
+
+        self._files = {column: open(self.column_path(column), "ab") for column in [TIME_COLUMN, *self.columns]}
+
+    def read(self, column: str, start: float, end: float, index: int = None):
+        if column not in self.columns:
+            return None, None
+
+        dtype, width = self.columns[column]
+
+        times = self._map(TIME_COLUMN, "float64", 1)
+        values = self._map(column, dtype, width)
+
+        if times is None or values is None:
+            return None, None
+
+        rows = min(len(times), len(values))
+        first, last = numpy.searchsorted(times[:rows], [start, end], side="left")
+
+        selected = values[first:last]
+
+        if width > 1:
+            selected = selected[:, index] if index is not None else selected
+
+        # Only the pages of the selected range are read from disk, the copy below is the result itself.
+        return numpy.array(times[first:last]), numpy.array(selected)
+
+    def _map(self, column: str, dtype: str, width: int):
+        path = self.column_path(column)
+        row_size = numpy.dtype(dtype).itemsize * width
+
+        try:
+            rows = os.path.getsize(path) // row_size
+        except OSError:
+            return None
+
+        if not rows:
+            return None
+
+        shape = (rows,) if width == 1 else (rows, width)
+
+        return numpy.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    def close(self):
+        for column_file in self._files.values():
+            column_file.close()
+
+        self._files = {}
+
+
+def downsample(times: numpy.ndarray, values: numpy.ndarray, points: int):
+    if points is None or len(times) <= points:
+        return times, values
+
+    # A single series keeps its peaks, per-core rows have no single shape to follow and are averaged.
+    if values.ndim == 1:
+        selected = lttb(times, values, points)
+        return times[selected], values[selected]
+
+    edges = numpy.linspace(0, len(times), max(points, 1) + 1).astype(int)
+    counts = numpy.diff(edges)
+
+    bucket_times = numpy.add.reduceat(times, edges[:-1]) / counts
+    bucket_values = numpy.add.reduceat(values, edges[:-1], axis=0) / counts[:, None]
+
+    return bucket_times, bucket_values
+
+
+class HistoryRecorder(object):
+    def __init__(
+        self,
+        directory: str,
+        columns: dict,
+        segment_seconds: float = 3600,
+        retention_seconds: float = 7 * 24 * 3600,
+    ):
+        self.directory = directory
+        self.columns = columns
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_seconds
+
+        self._segment = None
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, timestamp: float, values: dict):
+        with self._lock:
+            segment_start = timestamp - timestamp % self.segment_seconds
+
+            if self._segment is None or self._segment.start != segment_start:
+                self._rotate(segment_start, timestamp)
+
+            self._segment.append(timestamp, values)
+
+    def query(self, column: str, start: float, end: float, points: int = 500, index: int = None) -> dict:
+        parts = []
+
+        for segment in self._segments(start, end):
+            times, values = segment.read(column, start, end, index)
+
+            if times is not None and len(times):
+                parts.append((times, values))
+
+        if parts:
+            # Segments written before the number of cores changed cannot be stacked with the newer ones.
+            parts = [part for part in parts if part[1].shape[1:] == parts[-1][1].shape[1:]]
+
+            times = numpy.concatenate([times for times, _ in parts])
+            values = numpy.concatenate([values for _, values in parts])
+        else:
+            times, values = numpy.empty(0), numpy.empty(0)
+
+        times, values = downsample(times, values, points)
+
+        return {"column": column, "times": times.tolist(), "values": values.tolist()}
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def _segment_starts(self) -> list:
+        starts = []
+
+        for name in os.listdir(self.directory):
+            try:
+                starts.append(float(name))
+            except ValueError:
+                continue
+
+        return sorted(starts)
+
+    def _segments(self, start: float, end: float):
+        for segment_start in self._segment_starts():
+            if segment_start + self.segment_seconds < start or segment_start > end:
+                continue
+
+            try:
+                yield Segment(os.path.join(self.directory, f"{segment_start:.0f}"), segment_start)
+            except (OSError, ValueError):
+                continue
+
+    def _rotate(self, segment_start: float, now: float):
+        if self._segment is not None:
+            self._segment.close()
+
+        path = os.path.join(self.directory, f"{segment_start:.0f}")
+        exists = os.path.exists(os.path.join(path, "meta.json"))
+        self._segment = Segment(path, segment_start, None if exists else self.columns)
+
+        for old_start in self._segment_starts():
+            if old_start + self.segment_seconds < now - self.retention_seconds:
+                shutil.rmtree(os.path.join(self.directory, f"{old_start:.0f}"), ignore_errors=True)
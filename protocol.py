@@ -0,0 +1,121 @@
+import asyncio
+import struct
+from collections import namedtuple
+
+# length of the payload, message type, payload format, request id
+HEADER = struct.Struct("!IBBI")
+
+REQUEST = 1
+RESPONSE = 2
+SCHEMA = 3
+ERROR = 4
+SUBSCRIBE = 5
+UNSUBSCRIBE = 6
+PUSH = 7
+BATCH = 8
+
+MAX_PAYLOAD_SIZE = 64 * 1024 * 1024
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+Frame = namedtuple("Frame", ["message_type", "payload_format", "request_id", "payload"])
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class ConnectionClosed(ConnectionError):
+    pass
+
+
+class RequestError(Exception):
+    pass
+
+
+def encode_frame(message_type: int, payload_format: int, request_id: int, payload: bytes) -> bytes:
+    if len(payload) > MAX_PAYLOAD_SIZE:
+        raise ProtocolError(f"Payload too large: {len(payload)} bytes")
+
+    return b"".join((HEADER.pack(len(payload), message_type, payload_format, request_id), payload))
+
+
+async def read_frame(stream_reader) -> Frame:
+    try:
+        header = await stream_reader.readexactly(HEADER.size)
+        length, message_type, payload_format, request_id = HEADER.unpack(header)
+
+        if length > MAX_PAYLOAD_SIZE:
+            raise ProtocolError(f"Payload too large: {length} bytes")
+
+        payload = await stream_reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise ConnectionClosed("Connection closed by peer")
+
+    return Frame(message_type, payload_format, request_id, payload)
+
+
+class FrameReader(object):
+    def __init__(self, socket_object, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._socket_object = socket_object
+
+        self._buffer = bytearray(buffer_size)
+        self._start = 0
+        self._end = 0
+
+    def read_frames(self) -> list:
+        self._fill()
+
+        frames = []
+        frame = self._next_frame()
+
+        while frame is not None:
+            frames.append(frame)
+            frame = self._next_frame()
+
+        return frames
+
+    def _next_frame(self):
+        if self._end - self._start < HEADER.size:
+            self._reserve(HEADER.size)
+            return None
+
+        length, message_type, payload_format, request_id = HEADER.unpack_from(self._buffer, self._start)
+
+        if length > MAX_PAYLOAD_SIZE:
+            raise ProtocolError(f"Payload too large: {length} bytes")
+
+        payload_start = self._start + HEADER.size
+        payload_end = payload_start + length
+
+        if payload_end > self._end:
+            self._reserve(HEADER.size + length)
+            return None
+
+        payload = bytes(self._buffer[payload_start:payload_end])
+        self._start = payload_end
+
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        return Frame(message_type, payload_format, request_id, payload)
+
+    def _reserve(self, size: int):
+        if self._start + size <= len(self._buffer):
+            return
+
+        available = self._end - self._start
+        self._buffer[:available] = self._buffer[self._start:self._end]
+        self._start = 0
+        self._end = available
+
+        if size > len(self._buffer):
+            self._buffer.extend(bytes(size - len(self._buffer)))
+
+    def _fill(self):
+        with memoryview(self._buffer) as buffer_view:
+            received = self._socket_object.recv_into(buffer_view[self._end:])
+
+        if not received:
+            raise ConnectionClosed("Connection closed by peer")
+
+        self._end += received
@@ -0,0 +1,131 @@
+import threading
+
+import numpy
+
+from timeseries import RingBuffer
+
+# (bucket seconds, buckets kept): one hour of raw seconds, a day of 10s, a week of minutes and a year of hours.
+default_levels = [(1, 3600), (10, 8640), (60, 10080), (3600, 8760)]
+
+
+def lttb(times: numpy.ndarray, values: numpy.ndarray, threshold: int) -> numpy.ndarray:
+    length = len(times)
+
+    if threshold is None or threshold >= length:
+        return numpy.arange(length)
+
+    # Below three points there are no buckets in between, only the ends of the series are left.
+    if threshold < 3:
+        return numpy.array([0, length - 1])[:max(threshold, 1)]
+
+    every = (length - 2) / (threshold - 2)
+    selected = numpy.zeros(threshold, dtype=numpy.int64)
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        average_start = int((bucket + 1) * every) + 1
+        average_end = min(int((bucket + 2) * every) + 1, length)
+        average_time = times[average_start:average_end].mean()
+        average_value = values[average_start:average_end].mean()
+
+        range_start = int(bucket * every) + 1
+        range_end = int((bucket + 1) * every) + 1
+
+        # Keep the point that spans the largest triangle with the previous pick and the next bucket's average.
+        areas = numpy.abs(
+            (times[previous] - average_time) * (values[range_start:range_end] - values[previous])
+            - (times[previous] - times[range_start:range_end]) * (average_value - values[previous])
+        )
+
+        previous = range_start + int(numpy.argmax(areas))
+        selected[bucket + 1] = previous
+
+    selected[-1] = length - 1
+
+    return selected
+
+
+class RollupLevel(object):
+    def __init__(self, resolution: float, capacity: int):
+        self.resolution = resolution
+
+        # Closed buckets as rows of (start, min, max, sum, count).
+        self.buckets = RingBuffer(capacity, 5, numpy.float64)
+        self._current = None
+
+    def add(self, timestamp: float, value: float):
+        bucket_start = timestamp - timestamp % self.resolution
+
+        if self._current is not None and self._current[0] != bucket_start:
+            self.buckets.append(self._current)
+            self._current = None
+
+        if self._current is None:
+            self._current = [bucket_start, value, value, value, 1]
+        else:
+            self._current[1] = min(self._current[1], value)
+            self._current[2] = max(self._current[2], value)
+            self._current[3] += value
+            self._current[4] += 1
+
+    def covers(self, start: float) -> bool:
+        # A level that never wrapped still holds everything since the first sample.
+        return len(self.buckets) < self.buckets.capacity or self.buckets.view()[0, 0] <= start
+
+    def rows(self, start: float, end: float) -> numpy.ndarray:
+        rows = self.buckets.view()
+
+        if self._current is not None:
+            rows = numpy.vstack([rows, self._current])
+
+        first, last = numpy.searchsorted(rows[:, 0], [start - self.resolution, end], side="right")
+
+        return rows[first:last]
+
+
+class RollupEngine(object):
+    def __init__(self, levels: list = None):
+        self.levels = default_levels if levels is None else levels
+
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def add(self, metric: str, timestamp: float, value: float):
+        with self._lock:
+            levels = self._metrics.get(metric)
+
+            if levels is None:
+                levels = [RollupLevel(resolution, capacity) for resolution, capacity in self.levels]
+                self._metrics[metric] = levels
+
+            for level in levels:
+                level.add(timestamp, value)
+
+    def query(self, metric: str, start: float, end: float, points: int = 500) -> dict:
+        with self._lock:
+            levels = self._metrics.get(metric)
+
+            if levels is None:
+                raise KeyError(f"Unknown metric: {metric}")
+
+            # The finest level that still reaches back to start without returning far more buckets than points.
+            level = levels[-1]
+
+            for candidate in levels:
+                if candidate.covers(start) and (end - start) / candidate.resolution <= points * 4:
+                    level = candidate
+                    break
+
+            rows = level.rows(start, end)
+
+        averages = rows[:, 3] / numpy.maximum(rows[:, 4], 1)
+        selected = lttb(rows[:, 0], averages, points)
+
+        return {
+            "metric": metric,
+            "resolution": level.resolution,
+            "times": rows[selected, 0].tolist(),
+            "min": rows[selected, 1].tolist(),
+            "max": rows[selected, 2].tolist(),
+            "avg": averages[selected].tolist(),
+        }
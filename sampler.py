@@ -0,0 +1,178 @@
+import threading
+import time
+import traceback
+
+import psutil
+
+disk_rate_fields = {
+    "read_bytes_per_second": "read_bytes",
+    "write_bytes_per_second": "write_bytes",
+    "read_iops": "read_count",
+    "write_iops": "write_count",
+}
+
+network_rate_fields = {
+    "bytes_received_per_second": "bytes_recv",
+    "bytes_sent_per_second": "bytes_sent",
+    "packets_received_per_second": "packets_recv",
+    "packets_sent_per_second": "packets_sent",
+    "errors_in_per_second": "errin",
+    "errors_out_per_second": "errout",
+}
+
+rate_fields = {
+    "disk": disk_rate_fields,
+    "disk_total": disk_rate_fields,
+    "network": network_rate_fields,
+}
+
+
+def counter_rates(previous: dict, current: dict, elapsed: float, fields: dict) -> dict:
+    rates = {}
+
+    for name, counters in current.items():
+        previous_counters = previous.get(name)
+
+        # A device that just showed up has no reference point yet.
+        if previous_counters is None or elapsed <= 0:
+            continue
+
+        # Counters can go backwards when a device is reset or a counter wraps, that window just reads as idle.
+        rates[name] = {
+            rate: max(getattr(counters, field) - getattr(previous_counters, field), 0) / elapsed
+            for rate, field in fields.items()
+        }
+
+    return rates
+
+
+class Sampler(object):
+    def __init__(self, interval: float = 1.0, partitions=None):
+        self.interval = interval
+        self.partitions = partitions
+
+        self._snapshots = {}
+        self._listeners = []
+        self._counters = {}
+        self._counters_at = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        # The first non-blocking call only sets the reference point for the deltas.
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+        self._rates()
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def get(self, name: str, timeout: float = 5.0):
+        # A sampler that was never started or keeps failing must not hang the collector that asked for it.
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"No {name} sample within {timeout} seconds")
+
+        with self._lock:
+            return self._snapshots.get(name)
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            # A failing psutil call costs one sample, not the thread.
+            try:
+                self._sample()
+            except Exception:
+                traceback.print_exc()
+
+    def _read_counters(self) -> dict:
+        total = psutil.disk_io_counters()
+
+        return {
+            "disk": psutil.disk_io_counters(perdisk=True) or {},
+            "disk_total": {} if total is None else {"total": total},
+            "network": psutil.net_io_counters(pernic=True),
+        }
+
+    def _rates(self) -> dict:
+        counters = self._read_counters()
+        now = time.monotonic()
+
+        elapsed = 0 if self._counters_at is None else now - self._counters_at
+        rates = {
+            name: counter_rates(self._counters.get(name, {}), current, elapsed, rate_fields[name])
+            for name, current in counters.items()
+        }
+
+        self._counters = counters
+        self._counters_at = now
+
+        return rates
+
+    def _partition_usage(self) -> dict:
+        usage = {}
+
+        for partition in self.partitions() if self.partitions is not None else ():
+            try:
+                usage[partition.mountpoint] = psutil.disk_usage(partition.mountpoint).percent
+            except OSError:
+                continue
+
+        return usage
+
+    def _sample(self):
+        # Both calls run back to back, so the overall and per-core values cover the same window.
+        usage = psutil.cpu_percent(interval=None)
+        cores_usage = psutil.cpu_percent(interval=None, percpu=True)
+        rates = self._rates()
+
+        timestamp = time.time()
+        disk_total = rates["disk_total"].get("total", dict.fromkeys(disk_rate_fields, 0.0))
+
+        snapshots = {
+            "cpu": {
+                "timestamp": timestamp,
+                "usage": usage,
+                "cores_usage": cores_usage,
+            },
+            "ram": {
+                "timestamp": timestamp,
+                "percent_usage": psutil.virtual_memory().percent,
+            },
+            "disk": {
+                "timestamp": timestamp,
+                **disk_total,
+                "devices": rates["disk"],
+                "partitions": self._partition_usage(),
+            },
+            "network": {
+                "timestamp": timestamp,
+                "interfaces": rates["network"],
+            },
+        }
+
+        with self._lock:
+            self._snapshots.update(snapshots)
+
+        self._ready.set()
+
+        for listener in self._listeners:
+            try:
+                listener(timestamp, snapshots)
+            except Exception:
+                traceback.print_exc()
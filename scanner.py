@@ -0,0 +1,190 @@
+import asyncio
+import ipaddress
+import threading
+import time
+
+import nmap
+
+
+def parse_ports(ports: str) -> list:
+    parsed = set()
+
+    for part in ports.split(","):
+        part = part.strip()
+
+        if "-" in part:
+            first, last = part.split("-", 1)
+            parsed.update(range(int(first), int(last) + 1))
+        elif part:
+            parsed.add(int(part))
+
+    return sorted(parsed)
+
+
+def expand_target(target: str) -> list:
+    try:
+        network = ipaddress.ip_network(target, strict=False)
+    except ValueError:
+        return [target]
+
+    if network.num_addresses == 1:
+        return [str(network.network_address)]
+
+    return [str(address) for address in network.hosts()]
+
+
+class NmapScanner(object):
+    def scan(self, target: str, ports: str) -> list:
+        nm = nmap.PortScanner()
+        nm.scan(target, ports)
+
+        hosts = []
+
+        for host in nm.all_hosts():
+            host_info = {
+                "host": host,
+                "name": nm[host].hostname(),
+                "state": nm[host].state(),
+                "protocols": [],
+            }
+
+            for protocol_name in nm[host].all_protocols():
+                protocol = {"protocol": protocol_name, "ports": []}
+
+                for port in sorted(nm[host][protocol_name].keys()):
+                    protocol["ports"].append({"port": port, "state": nm[host][protocol_name][port]["state"]})
+
+                host_info["protocols"].append(protocol)
+
+            hosts.append(host_info)
+
+        return hosts
+
+
+class TcpConnectScanner(object):
+    def __init__(self, concurrency: int = 256, timeout: float = 0.5):
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def scan(self, target: str, ports: str) -> list:
+        return asyncio.run(self.scan_async(target, ports))
+
+    async def scan_async(self, target: str, ports: str) -> list:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        port_numbers = parse_ports(ports)
+
+        hosts = await asyncio.gather(*[
+            self._scan_host(semaphore, host, port_numbers) for host in expand_target(target)
+        ])
+
+        return [host for host in hosts if host is not None]
+
+    async def _scan_host(self, semaphore: asyncio.Semaphore, host: str, port_numbers: list):
+        states = await asyncio.gather(*[self._probe(semaphore, host, port) for port in port_numbers])
+
+        # Like nmap, a refused connection still proves the host is up, but only open ports are listed.
+        if all(state == "filtered" for state in states):
+            return None
+
+        return {
+            "host": host,
+            "name": await self._hostname(host),
+            "state": "up",
+            "protocols": [{
+                "protocol": "tcp",
+                "ports": [
+                    {"port": port, "state": state} for port, state in zip(port_numbers, states) if state == "open"
+                ],
+            }],
+        }
+
+    async def _probe(self, semaphore: asyncio.Semaphore, host: str, port: int) -> str:
+        async with semaphore:
+            try:
+                _, stream_writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+            except ConnectionRefusedError:
+                return "closed"
+            except (asyncio.TimeoutError, OSError):
+                return "filtered"
+
+            stream_writer.close()
+
+            try:
+                await stream_writer.wait_closed()
+            except OSError:
+                pass
+
+            return "open"
+
+    async def _hostname(self, host: str) -> str:
+        try:
+            name, _ = await asyncio.wait_for(asyncio.get_running_loop().getnameinfo((host, 0)), self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return ""
+
+        return "" if name == host else name
+
+
+scanners = {
+    "nmap": NmapScanner,
+    "tcp": TcpConnectScanner,
+}
+
+
+class ScanScheduler(object):
+    def __init__(self, scanner, targets: list, ports: str, ttl: float = 300.0):
+        self.scanner = scanner
+        self.targets = targets
+        self.ports = ports
+        self.ttl = ttl
+
+        self._hosts = []
+        self._completed_at = None
+        self._attempted_at = None
+        self._error = None
+
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def latest(self) -> dict:
+        with self._lock:
+            now = time.time()
+            age = None if self._completed_at is None else now - self._completed_at
+            stale = age is None or age > self.ttl
+
+            # A failed scan is not retried before the ttl runs out either, so a missing nmap is not hammered.
+            retry = self._attempted_at is None or now - self._attempted_at > self.ttl
+
+            # Only one scan runs at a time, every request meanwhile gets the previous result right away.
+            if stale and retry and self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+            return {
+                "hosts": self._hosts,
+                "completed_at": self._completed_at,
+                "age": age,
+                "stale": stale,
+                "scanning": self._thread is not None,
+                "error": self._error,
+            }
+
+    def _run(self):
+        hosts = []
+        error = None
+
+        try:
+            for target in self.targets:
+                hosts.extend(self.scanner.scan(target, self.ports))
+        except Exception as exception:
+            error = str(exception)
+
+        with self._lock:
+            self._attempted_at = time.time()
+            self._error = error
+
+            if error is None:
+                self._hosts = hosts
+                self._completed_at = self._attempted_at
+
+            self._thread = None
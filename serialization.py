@@ -0,0 +1,178 @@
+import struct
+
+import msgpack
+
+from protocol import SCHEMA, ProtocolError, encode_frame
+
+MSGPACK = 1
+STRUCT = 2
+
+TABLE_EXT_TYPE = 1
+
+SCHEMA_ID = struct.Struct("!H")
+ARRAY_LENGTH = struct.Struct("!H")
+
+
+class Schema(object):
+    def __init__(self, schema_id: int, name: str, fields: list):
+        self.schema_id = schema_id
+        self.name = name
+        self.fields = [tuple(field) for field in fields]
+
+        self.field_names = frozenset(field_name for field_name, _ in self.fields)
+        self._scalar_fields = [field_name for field_name, kind in self.fields if not kind.endswith("[]")]
+        self._array_fields = [(field_name, kind[:-2]) for field_name, kind in self.fields if kind.endswith("[]")]
+        self._scalars = struct.Struct("!" + "".join(kind for _, kind in self.fields if not kind.endswith("[]")))
+
+    def describe(self):
+        return {"id": self.schema_id, "name": self.name, "fields": self.fields}
+
+    def matches(self, data) -> bool:
+        return isinstance(data, dict) and data.keys() == self.field_names
+
+    def pack(self, data: dict) -> bytes:
+        parts = [
+            SCHEMA_ID.pack(self.schema_id),
+            self._scalars.pack(*[data[field_name] for field_name in self._scalar_fields]),
+        ]
+
+        for field_name, kind in self._array_fields:
+            values = data[field_name]
+            parts.append(ARRAY_LENGTH.pack(len(values)))
+            parts.append(struct.pack(f"!{len(values)}{kind}", *values))
+
+        return b"".join(parts)
+
+    def unpack(self, payload) -> dict:
+        offset = SCHEMA_ID.size
+        data = dict(zip(self._scalar_fields, self._scalars.unpack_from(payload, offset)))
+        offset += self._scalars.size
+
+        for field_name, kind in self._array_fields:
+            (length,) = ARRAY_LENGTH.unpack_from(payload, offset)
+            offset += ARRAY_LENGTH.size
+
+            array = struct.Struct(f"!{length}{kind}")
+            data[field_name] = list(array.unpack_from(payload, offset))
+            offset += array.size
+
+        return {field_name: data[field_name] for field_name, _ in self.fields}
+
+
+SCHEMAS = {
+    "cpu": Schema(1, "cpu", [
+        ("static_version", "I"),
+        ("current_frequency", "d"),
+        ("usage", "d"),
+        ("cores_usage", "d[]"),
+    ]),
+    "ram": Schema(2, "ram", [
+        ("total_gb", "d"),
+        ("used_gb", "d"),
+        ("available_gb", "d"),
+        ("percent_usage", "d"),
+        ("percent_available", "d"),
+    ]),
+}
+
+
+def _is_table(value) -> bool:
+    if not isinstance(value, list) or not value or not isinstance(value[0], dict):
+        return False
+
+    columns = list(value[0])
+
+    # Rows are packed by position, so the keys must also come in the same order.
+    return all(isinstance(row, dict) and list(row) == columns for row in value)
+
+
+def _pack_table(rows: list):
+    columns = list(rows[0].keys())
+    packed = msgpack.packb([columns, [list(row.values()) for row in rows]], use_bin_type=True)
+
+    return msgpack.ExtType(TABLE_EXT_TYPE, packed)
+
+
+def _unpack_table(code: int, packed: bytes):
+    if code != TABLE_EXT_TYPE:
+        return msgpack.ExtType(code, packed)
+
+    columns, rows = msgpack.unpackb(packed, raw=False, strict_map_key=False)
+
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class MsgpackSerializer(object):
+    format_id = MSGPACK
+
+    def dumps(self, data) -> bytes:
+        # Lists of same-shaped records (e.g. processes) are sent as one column header plus rows.
+        if _is_table(data):
+            data = _pack_table(data)
+        elif isinstance(data, dict):
+            data = {key: _pack_table(value) if _is_table(value) else value for key, value in data.items()}
+
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, payload):
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False, ext_hook=_unpack_table)
+
+
+class StructSerializer(object):
+    format_id = STRUCT
+
+    def __init__(self):
+        self.schemas = {}
+
+    def register(self, schema: Schema):
+        self.schemas[schema.schema_id] = schema
+
+    def dumps(self, data, schema: Schema) -> bytes:
+        return schema.pack(data)
+
+    def loads(self, payload):
+        (schema_id,) = SCHEMA_ID.unpack_from(payload)
+
+        if schema_id not in self.schemas:
+            raise ProtocolError(f"Unknown schema: {schema_id}")
+
+        return self.schemas[schema_id].unpack(payload)
+
+
+class MessageCodec(object):
+    def __init__(self, schemas: dict = None):
+        self._schemas = SCHEMAS if schemas is None else schemas
+
+        self._msgpack = MsgpackSerializer()
+        self._struct = StructSerializer()
+        self._serializers = {MSGPACK: self._msgpack, STRUCT: self._struct}
+
+        self._announced_schemas = set()
+
+    def encode(self, message_type: int, request_id: int, data, schema_name: str = None) -> bytes:
+        schema = self._schemas.get(schema_name)
+
+        if schema is None or not schema.matches(data):
+            return encode_frame(message_type, MSGPACK, request_id, self._msgpack.dumps(data))
+
+        frames = []
+
+        if schema.schema_id not in self._announced_schemas:
+            frames.append(encode_frame(SCHEMA, MSGPACK, 0, self._msgpack.dumps(schema.describe())))
+            self._announced_schemas.add(schema.schema_id)
+
+        frames.append(encode_frame(message_type, STRUCT, request_id, self._struct.dumps(data, schema)))
+
+        return b"".join(frames)
+
+    def decode(self, frame):
+        if frame.payload_format not in self._serializers:
+            raise ProtocolError(f"Unknown payload format: {frame.payload_format}")
+
+        data = self._serializers[frame.payload_format].loads(frame.payload)
+
+        if frame.message_type == SCHEMA:
+            self._struct.register(Schema(data["id"], data["name"], data["fields"]))
+            return None
+
+        return data
@@ -1,15 +1,26 @@
+import asyncio
+import heapq
+import math
+import operator
 import platform
-import pickle
 import socket
-import sys
 import threading
 import time
-from queue import Queue
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import cpuinfo
-import nmap
 import psutil
 
+from protocol import (
+    BATCH, ERROR, PUSH, REQUEST, RESPONSE, SUBSCRIBE, UNSUBSCRIBE, ConnectionClosed, ProtocolError, read_frame
+)
+from history import HistoryRecorder
+from rollup import RollupEngine
+from sampler import Sampler
+from scanner import ScanScheduler, scanners
+from serialization import MessageCodec
+
 gb = 1024 * 1024 * 1024
 
 
@@ -26,7 +37,7 @@ def get_plataform_info():
     }
 
 
-def get_cpu_info():
+def get_static_cpu_info():
     cpu_info = cpuinfo.get_cpu_info()
     cpu_freq = psutil.cpu_freq()
 
@@ -36,11 +47,62 @@ def get_cpu_info():
         "bits": cpu_info["bits"],
         "min_frequency": round(cpu_freq.min, 2),
         "max_frequency": round(cpu_freq.max, 2),
-        "current_frequency": round(cpu_freq.current, 2),
         "physical_cores_number": psutil.cpu_count(logical=False),
         "cores_number": psutil.cpu_count(logical=True),
-        "usage": psutil.cpu_percent(interval=1),
-        "cores_usage": psutil.cpu_percent(interval=1, percpu=True),
+    }
+
+
+class StaticFacts(object):
+    def __init__(self):
+        self._facts = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._facts is None:
+                self._facts = {
+                    "cpu": get_static_cpu_info(),
+                    "system": get_plataform_info(),
+                }
+                self._version = zlib.crc32(repr(sorted(self._facts.items())).encode())
+
+            return self._facts, self._version
+
+    @property
+    def version(self):
+        return self.get()[1]
+
+    def invalidate(self):
+        with self._lock:
+            self._facts = None
+            self._version = None
+
+
+static_facts = StaticFacts()
+
+
+def get_static_info():
+    facts, version = static_facts.get()
+
+    return {"version": version, **facts}
+
+
+def get_system_info():
+    facts, version = static_facts.get()
+
+    return {"static_version": version, **facts["system"]}
+
+
+def get_cpu_info():
+    cpu_freq = psutil.cpu_freq()
+    cpu_sample = sampler.get("cpu")
+
+    return {
+        "static_version": static_facts.version,
+        "current_frequency": round(cpu_freq.current, 2),
+        "usage": cpu_sample["usage"],
+        "cores_usage": cpu_sample["cores_usage"],
     }
 
 
@@ -56,15 +118,62 @@ def get_ram_info():
     }
 
 
+class DiskPartitions(object):
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+
+        self._partitions = None
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def get(self) -> list:
+        with self._lock:
+            now = time.monotonic()
+
+            # Mounts rarely change, the usage of each one is still read on every request.
+            if self._partitions is None or now - self._refreshed_at > self.refresh_interval:
+                partitions = {}
+
+                for partition in psutil.disk_partitions():
+                    partitions.setdefault(partition.device, partition)
+
+                self._partitions = list(partitions.values())
+                self._refreshed_at = now
+
+            return self._partitions
+
+
+disk_partitions = DiskPartitions()
+
+
 def get_disk_info():
-    disk_usage = psutil.disk_usage(".")
+    partitions = []
+
+    for partition in disk_partitions.get():
+        try:
+            disk_usage = psutil.disk_usage(partition.mountpoint)
+        except OSError:
+            continue
+
+        partitions.append({
+            "device": partition.device,
+            "mountpoint": partition.mountpoint,
+            "fstype": partition.fstype,
+            "total_gb": round(disk_usage.total / gb, 2),
+            "used_gb": round(disk_usage.used / gb, 2),
+            "available_gb": round(disk_usage.free / gb, 2),
+            "used_percent": disk_usage.percent,
+        })
+
+    disk_sample = sampler.get("disk")
 
     return {
-        "gize_gb": round(disk_usage.total / gb, 2),
-        "used_gb": round(disk_usage.used / gb, 2),
-        "available_gb": round(disk_usage.free / gb, 2),
-        "used_percent": disk_usage.percent,
-        "available_percent": round(100 - disk_usage.percent, 1),
+        "read_bytes_per_second": disk_sample["read_bytes_per_second"],
+        "write_bytes_per_second": disk_sample["write_bytes_per_second"],
+        "read_iops": disk_sample["read_iops"],
+        "write_iops": disk_sample["write_iops"],
+        "partitions": partitions,
+        "devices": [{"device": device, **rates} for device, rates in sorted(disk_sample["devices"].items())],
     }
 
 
@@ -80,101 +189,624 @@ def get_network_info():
                     "netmask": address.netmask if address.netmask is not None else "Ausente",
                 })
 
-    nm = nmap.PortScanner()
-    nm.scan("127.0.0.1", "22-443")
-    nm.command_line()
-    nm.scaninfo()
+    scan = scan_scheduler.latest()
+    network_sample = sampler.get("network")
 
-    hosts = []
+    return {
+        "interfaces": interfaces,
+        "traffic": [
+            {"interface": interface, **rates} for interface, rates in sorted(network_sample["interfaces"].items())
+        ],
+        "hosts": scan["hosts"],
+        "scan": {
+            "completed_at": scan["completed_at"],
+            "age": scan["age"],
+            "stale": scan["stale"],
+            "scanning": scan["scanning"],
+            "error": scan["error"],
+        },
+    }
 
-    for host in nm.all_hosts():
-        host_info = {
-            "host": host, 
-            "name": nm[host].hostname(),
-            "state": nm[host].state(), 
-            "protocols": []
-        }
 
-        for protocol in nm[host].all_protocols():
-            protocol = {"protocol": protocol, "ports": []}
+class ProcessCollector(object):
+    def __init__(self, cpu_window: float = 1.0):
+        self.cpu_window = cpu_window
+
+        self._static_fields = {}
+        self._cpu_samples = {}
+        self._lock = threading.Lock()
+
+    def collect(self):
+        with self._lock:
+            return self._collect()
+
+    def _cpu_percent(self, key: tuple, cpu_time: float, now: float) -> float:
+        sample = self._cpu_samples.get(key)
+
+        # The first sighting only sets the reference point, like psutil.cpu_percent(interval=None).
+        if sample is None:
+            self._cpu_samples[key] = (cpu_time, now, 0.0)
+            return 0.0
+
+        previous_time, previous_now, cpu_percent = sample
+
+        # Collections closer together than the window keep the last value instead of measuring a tiny noisy delta.
+        if now - previous_now >= self.cpu_window:
+            cpu_percent = max(cpu_time - previous_time, 0.0) / (now - previous_now) * 100
+            self._cpu_samples[key] = (cpu_time, now, cpu_percent)
+
+        return cpu_percent
+
+    def _collect(self):
+        processes = []
+        seen = set()
+
+        total_memory = psutil.virtual_memory().total
+        now = time.monotonic()
 
-            ports_list = nm[host][protocol["protocol"]].keys()
-            list(ports_list).sort()
-            for port in ports_list:
-                protocol["ports"].append({"port": port, "state": nm[host][protocol["protocol"]][port]["state"]})
+        for process in psutil.process_iter():
+            try:
+                with process.oneshot():
+                    create_time = process.create_time()
+                    key = (process.pid, create_time)
 
-            host_info["protocols"].append(protocol)
+                    static_fields = self._static_fields.get(key)
 
-    return {"interfaces": interfaces, "hosts": hosts}
+                    if static_fields is None:
+                        static_fields = {"name": process.name(), "created_date": time.ctime(create_time)}
+                        self._static_fields[key] = static_fields
+
+                    memory_info = process.memory_info()
+                    cpu_times = process.cpu_times()
+                    cpu_time = cpu_times.user + cpu_times.system
+
+                    processes.append({
+                        "pid": process.pid,
+                        "name": static_fields["name"],
+                        "used_memory": memory_info.rss / 1024 / 1024,
+                        "memory_use_percent": memory_info.rss / total_memory * 100,
+                        "used_threads": process.num_threads(),
+                        "cpu_percent": self._cpu_percent(key, cpu_time, now),
+                        "cpu_time": cpu_time,
+                        "created_date": static_fields["created_date"],
+                    })
+
+                    seen.add(key)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        for key in self._static_fields.keys() - seen:
+            del self._static_fields[key]
+
+        for key in self._cpu_samples.keys() - seen:
+            del self._cpu_samples[key]
+
+        processes.reverse()
+
+        return processes
+
+
+process_collector = ProcessCollector()
 
 
 def get_processes():
-    processes = []
-
-    pids = psutil.pids()
-    pids.reverse()
-
-    for pid in pids:
-        process = psutil.Process(pid)
-        processes.append({
-            "name": process.name(),
-            "used_memory": process.memory_info().rss / 1024 / 1024,
-            "memory_use_percent": process.memory_percent(),
-            "used_threads": process.num_threads(),
-            "created_time": process.cpu_times().user,
-            "created_date": time.ctime(process.create_time()),
-        })
+    return process_collector.collect()
 
-    return processes
 
+class ProcessDiffer(object):
+    def __init__(self):
+        self._sequence = 0
+        self._snapshot = None
 
-queue_data = Queue()
+    def diff(self, processes: list, since: int = None) -> dict:
+        previous = self._snapshot
 
+        self._snapshot = {process["pid"]: process for process in processes}
+        self._sequence += 1
 
-def get_data(data_name: str, request_uuid: str):
-    get_info = {
-        "system": get_plataform_info,
-        "cpu": get_cpu_info,
-        "ram": get_ram_info,
-        "disk": get_disk_info,
-        "network": get_network_info,
-        "processes": get_processes,
-    }
+        # Anything but the sequence we sent last means the client lost track, so it gets everything again.
+        if previous is None or since != self._sequence - 1:
+            return {"sequence": self._sequence, "full": True, "processes": processes}
+
+        added = []
+        changed = []
+
+        for pid, process in self._snapshot.items():
+            previous_process = previous.get(pid)
+
+            if previous_process is None:
+                added.append(process)
+                continue
+
+            changed_fields = {key: value for key, value in process.items() if previous_process[key] != value}
+
+            if changed_fields:
+                changed.append({"pid": pid, **changed_fields})
 
-    queue_data.put({"uuid": request_uuid, "data": get_info[data_name]()})
+        return {
+            "sequence": self._sequence,
+            "full": False,
+            "added": added,
+            "removed": [pid for pid in previous if pid not in self._snapshot],
+            "changed": changed,
+        }
+
+
+process_sort_keys = {
+    "pid", "name", "used_memory", "memory_use_percent", "used_threads", "cpu_percent", "cpu_time"
+}
+process_query_params = {"sort", "descending", "limit", "offset", "name", "min_memory"}
+
+
+def select_processes(processes: list, params: dict):
+    name = params.get("name")
+    min_memory = params.get("min_memory")
 
+    if name:
+        name = name.lower()
+        processes = [process for process in processes if name in process["name"].lower()]
 
-socket_object = socket.socket()
-host = socket.gethostname()
-print()
-port = int(input("Informe a porta do servidor: "))
-socket_object.bind((host, port))
+    if min_memory is not None:
+        processes = [process for process in processes if process["used_memory"] >= min_memory]
 
-print()
+    total = len(processes)
 
-print("Servidor iniciado")
+    sort_key = params.get("sort")
+    descending = params.get("descending", True)
+    offset = params.get("offset", 0)
+    limit = params.get("limit")
 
-socket_object.listen(5)
-connection, addr = socket_object.accept()
+    if sort_key is not None:
+        if sort_key not in process_sort_keys:
+            raise ProtocolError(f"Unknown sort key: {sort_key}")
 
-print(f"Conexão estabelecida com {addr[0]}:{addr[1]}")
+        key = operator.itemgetter(sort_key)
 
-while True:
-    if queue_data.empty():
-        received_data = connection.recv(1024)
+        # Only the first offset + limit rows are needed, a heap keeps that at O(n log k).
+        if limit is not None:
+            select = heapq.nlargest if descending else heapq.nsmallest
+            processes = select(offset + limit, processes, key=key)
+        else:
+            processes = sorted(processes, key=key, reverse=descending)
 
-        if not received_data:
-            print("Servidor encerrado")
-            break
+    if limit is not None:
+        processes = processes[offset:offset + limit]
+    elif offset:
+        processes = processes[offset:]
 
-        formatted_data = pickle.loads(received_data)
+    return processes, total
 
-        get_data_thread = threading.Thread(target=get_data, args=(formatted_data["data"], formatted_data["uuid"]))
-        get_data_thread.start()
 
+def query_processes(processes: list, params: dict, session: dict):
+    total = None
+
+    if params.keys() & process_query_params:
+        processes, total = select_processes(processes, params)
+
+    if "since" in params:
+        differ = session.setdefault("process_differ", ProcessDiffer())
+        response = differ.diff(processes, params["since"])
+    elif total is not None:
+        response = {"processes": processes}
     else:
-        connection.send(pickle.dumps(queue_data.get()))
+        return processes
+
+    if total is not None:
+        response["total"] = total
+
+    return response
+
+
+sampler_interval = 1.0
+sampler = Sampler(interval=sampler_interval, partitions=disk_partitions.get)
+
+scan_backend = "tcp"
+scan_targets = ["127.0.0.1"]
+scan_ports = "22-443"
+scan_ttl = 300.0
+scan_scheduler = ScanScheduler(scanners[scan_backend](), scan_targets, scan_ports, scan_ttl)
+
+executor_workers = 4
+
+collectors = {
+    "static": get_static_info,
+    "system": get_system_info,
+    "cpu": get_cpu_info,
+    "ram": get_ram_info,
+    "disk": get_disk_info,
+    "network": get_network_info,
+    "processes": get_processes,
+}
+
+queries = {
+    "processes": query_processes,
+}
+
+history_directory = "history"
+history_segment_seconds = 3600
+history_retention_seconds = 7 * 24 * 3600
+history_recorder = None
+
+
+def partition_metric(mountpoint: str) -> str:
+    return f"disk.used_percent:{mountpoint}"
+
+
+def create_history_recorder():
+    cores = psutil.cpu_count(logical=True)
+
+    # One usage column per partition mounted at startup, a mount that shows up later only goes to the rollups.
+    return HistoryRecorder(
+        history_directory,
+        {
+            "cpu.usage": ("float32", 1),
+            "cpu.cores": ("float32", cores),
+            "ram.percent_usage": ("float32", 1),
+            "disk.read_bytes_per_second": ("float32", 1),
+            "disk.write_bytes_per_second": ("float32", 1),
+            **{partition_metric(partition.mountpoint): ("float32", 1) for partition in disk_partitions.get()},
+        },
+        history_segment_seconds,
+        history_retention_seconds,
+    )
+
+
+def record_history(timestamp: float, snapshots: dict):
+    history_recorder.record(timestamp, {
+        "cpu.usage": snapshots["cpu"]["usage"],
+        "cpu.cores": snapshots["cpu"]["cores_usage"],
+        "ram.percent_usage": snapshots["ram"]["percent_usage"],
+        "disk.read_bytes_per_second": snapshots["disk"]["read_bytes_per_second"],
+        "disk.write_bytes_per_second": snapshots["disk"]["write_bytes_per_second"],
+        **{
+            partition_metric(mountpoint): used_percent
+            for mountpoint, used_percent in snapshots["disk"]["partitions"].items()
+        },
+    })
+
+
+def get_history(params: dict):
+    if history_recorder is None:
+        raise ProtocolError("History is not being recorded")
+
+    end = params.get("end", time.time())
+    start = params.get("start", end - 3600)
+
+    return history_recorder.query(params["column"], start, end, params.get("points", 500), params.get("index"))
+
+
+rollup_engine = RollupEngine()
+
+
+def record_rollups(timestamp: float, snapshots: dict):
+    rollup_engine.add("cpu.usage", timestamp, snapshots["cpu"]["usage"])
+    rollup_engine.add("ram.percent_usage", timestamp, snapshots["ram"]["percent_usage"])
+    rollup_engine.add("disk.read_bytes_per_second", timestamp, snapshots["disk"]["read_bytes_per_second"])
+    rollup_engine.add("disk.write_bytes_per_second", timestamp, snapshots["disk"]["write_bytes_per_second"])
+
+    for mountpoint, used_percent in snapshots["disk"]["partitions"].items():
+        rollup_engine.add(partition_metric(mountpoint), timestamp, used_percent)
+
+
+def get_rollup(params: dict):
+    end = params.get("end", time.time())
+    start = params.get("start", end - 3600)
+
+    try:
+        return rollup_engine.query(params["metric"], start, end, params.get("points", 500))
+    except KeyError:
+        raise ProtocolError(f"Unknown metric: {params['metric']}")
+
+
+handlers = {
+    "history": get_history,
+    "rollup": get_rollup,
+}
+
+
+minimum_subscription_interval = 0.5
+maximum_write_buffer = 1024 * 1024
+
+
+class Subscription(object):
+    def __init__(self, session: dict, codec: MessageCodec, stream_writer, subscription_id: int, message: dict):
+        self.session = session
+        self.codec = codec
+        self.stream_writer = stream_writer
+        self.subscription_id = subscription_id
+
+        self.data_name = message["data"]
+        self.params = message.get("params") or {}
+        interval = float(message.get("interval", 1.0))
+
+        if not math.isfinite(interval):
+            raise ValueError(f"Invalid interval: {interval}")
+
+        self.interval = max(interval, minimum_subscription_interval)
+        self.next_due = 0.0
+
+
+class MonitorServer(object):
+    def __init__(
+        self,
+        collectors: dict,
+        queries: dict = None,
+        handlers: dict = None,
+        max_workers: int = executor_workers,
+    ):
+        self._collectors = collectors
+        self._queries = {} if queries is None else queries
+        self._handlers = {} if handlers is None else handlers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._in_flight = {}
+
+        self._subscriptions = {}
+        self._subscriptions_changed = None
+        self._scheduler_task = None
+        self._push_tasks = {}
+
+    async def collect(self, data_name: str):
+        if data_name not in self._collectors:
+            raise ProtocolError(f"Unknown data: {data_name}")
+
+        future = self._in_flight.get(data_name)
+
+        # Identical concurrent requests wait on the same collection instead of starting a new one.
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._collectors[data_name])
+            future.add_done_callback(lambda _: self._in_flight.pop(data_name, None))
+            self._in_flight[data_name] = future
+
+        return await asyncio.shield(future)
+
+    async def handle_connection(self, stream_reader, stream_writer):
+        address = stream_writer.get_extra_info("peername")
+        print(f"Conexão estabelecida com {address[0]}:{address[1]}")
+
+        codec = MessageCodec()
+        session = {}
+        tasks = set()
+
+        try:
+            while True:
+                frame = await read_frame(stream_reader)
+                message = codec.decode(frame)
+
+                if frame.message_type == REQUEST:
+                    task = asyncio.create_task(self._handle_request(codec, session, stream_writer, frame.request_id, message))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif frame.message_type == BATCH:
+                    task = asyncio.create_task(self._handle_batch(codec, session, stream_writer, frame.request_id, message))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif frame.message_type == SUBSCRIBE:
+                    try:
+                        self.subscribe(Subscription(session, codec, stream_writer, frame.request_id, message))
+                    except Exception as exception:
+                        stream_writer.write(codec.encode(ERROR, frame.request_id, {"error": str(exception)}))
+                elif frame.message_type == UNSUBSCRIBE:
+                    self.unsubscribe(session, frame.request_id)
+        except (ConnectionClosed, ConnectionError, ProtocolError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            for subscription_id in list(session.get("subscriptions", ())):
+                self.unsubscribe(session, subscription_id)
+
+            stream_writer.close()
+            print(f"Conexão encerrada com {address[0]}:{address[1]}")
+
+    async def answer(self, data_name: str, params: dict, session: dict):
+        # Handlers depend on the request params, so they are neither shared nor deduplicated.
+        if data_name in self._handlers:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._handlers[data_name], params)
+
+        data = await self.collect(data_name)
+
+        # Collections are shared between requests, shaping the result for this client happens afterwards.
+        if data_name in self._queries:
+            data = self._queries[data_name](data, params, session)
+
+        return data
+
+    async def _handle_request(self, codec: MessageCodec, session: dict, stream_writer, request_id: int, message: dict):
+        # A malformed request still gets its ERROR reply instead of leaving the client waiting.
+        try:
+            data_name = message["data"]
+            data = await self.answer(data_name, message.get("params") or {}, session)
+        except Exception as exception:
+            stream_writer.write(codec.encode(ERROR, request_id, {"error": str(exception)}))
+        else:
+            stream_writer.write(codec.encode(RESPONSE, request_id, data, data_name))
+
+        await stream_writer.drain()
+
+    async def _handle_batch(self, codec: MessageCodec, session: dict, stream_writer, request_id: int, message: dict):
+        try:
+            requests = message["requests"]
+            data_names = list({request["data"] for request in requests if request["data"] not in self._handlers})
+            handled_requests = [request for request in requests if request["data"] in self._handlers]
+        except Exception as exception:
+            stream_writer.write(codec.encode(ERROR, request_id, {"error": str(exception)}))
+            await stream_writer.drain()
+            return
+
+        # Every distinct collector runs once, all of them in parallel, before the per-request queries.
+        collected, handled = await asyncio.gather(
+            asyncio.gather(*[self.collect(data_name) for data_name in data_names], return_exceptions=True),
+            asyncio.gather(*[
+                self.answer(request["data"], request.get("params") or {}, session) for request in handled_requests
+            ], return_exceptions=True),
+        )
+        collected = dict(zip(data_names, collected))
+        handled = iter(handled)
+
+        results = []
+
+        for request in requests:
+            data_name = request["data"]
+
+            try:
+                if data_name in self._handlers:
+                    data = next(handled)
+                else:
+                    data = collected[data_name]
+
+                if isinstance(data, Exception):
+                    raise data
+
+                if data_name in self._queries:
+                    data = self._queries[data_name](data, request.get("params") or {}, session)
+            except Exception as exception:
+                results.append({"data": data_name, "error": str(exception)})
+            else:
+                results.append({"data": data_name, "result": data})
+
+        stream_writer.write(codec.encode(RESPONSE, request_id, {"results": results}))
+        await stream_writer.drain()
+
+    def subscribe(self, subscription: Subscription):
+        # Only collectors can be pushed, anything else is refused once instead of failing on every tick.
+        if subscription.data_name not in self._collectors:
+            raise ProtocolError(f"Unknown data: {subscription.data_name}")
+
+        if self._scheduler_task is None:
+            self._subscriptions_changed = asyncio.Event()
+            self._scheduler_task = asyncio.create_task(self._run_scheduler())
+
+        session = subscription.session
+        session.setdefault("subscriptions", set()).add(subscription.subscription_id)
+
+        # The first sample goes out right away, the following ones every interval from now on.
+        subscription.next_due = asyncio.get_running_loop().time()
+
+        self._subscriptions[(id(session), subscription.subscription_id)] = subscription
+        self._subscriptions_changed.set()
+
+    def unsubscribe(self, session: dict, subscription_id: int):
+        session.get("subscriptions", set()).discard(subscription_id)
+        self._subscriptions.pop((id(session), subscription_id), None)
+
+    async def _run_scheduler(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            self._subscriptions_changed.clear()
+
+            now = loop.time()
+            next_due = min((subscription.next_due for subscription in self._subscriptions.values()), default=None)
+
+            if next_due is None or next_due > now:
+                timeout = None if next_due is None else next_due - now
+
+                try:
+                    await asyncio.wait_for(self._subscriptions_changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+                continue
+
+            due = [subscription for subscription in self._subscriptions.values() if subscription.next_due <= now]
+
+            for subscription in due:
+                subscription.next_due += subscription.interval
+
+                # A subscription that fell behind starts over from now instead of catching up in a burst.
+                if subscription.next_due <= now:
+                    subscription.next_due = now + subscription.interval
+
+            by_data_name = {}
+
+            for subscription in due:
+                by_data_name.setdefault(subscription.data_name, []).append(subscription)
+
+            # Each collector runs once per tick no matter how many clients are subscribed to it, and pushes as soon
+            # as it is done. A collector still running from an earlier tick skips this one.
+            for data_name, subscriptions in by_data_name.items():
+                if data_name not in self._push_tasks:
+                    task = asyncio.create_task(self._collect_and_push(data_name, subscriptions))
+                    task.add_done_callback(lambda _, data_name=data_name: self._push_tasks.pop(data_name, None))
+                    self._push_tasks[data_name] = task
+
+    async def _collect_and_push(self, data_name: str, subscriptions: list):
+        try:
+            data = await self.collect(data_name)
+        except Exception as exception:
+            data = exception
+
+        for subscription in subscriptions:
+            self._push(subscription, data)
+
+    def _push(self, subscription: Subscription, data):
+        stream_writer = subscription.stream_writer
+
+        # A client that cannot keep up skips samples instead of growing the buffer forever.
+        if stream_writer.is_closing() or stream_writer.transport.get_write_buffer_size() > maximum_write_buffer:
+            return
+
+        try:
+            if isinstance(data, Exception):
+                raise data
+
+            if subscription.data_name in self._queries:
+                data = self._queries[subscription.data_name](data, subscription.params, subscription.session)
+        except Exception as exception:
+            stream_writer.write(subscription.codec.encode(ERROR, subscription.subscription_id, {"error": str(exception)}))
+        else:
+            stream_writer.write(
+                subscription.codec.encode(PUSH, subscription.subscription_id, data, subscription.data_name)
+            )
+
+    def close(self):
+        if self._scheduler_task is not None:
+            self._scheduler_task.cancel()
+
+        for task in list(self._push_tasks.values()):
+            task.cancel()
+
+        self._executor.shutdown(wait=False)
+
+
+async def serve(host: str, port: int):
+    monitor_server = MonitorServer(collectors, queries, handlers)
+    server = await asyncio.start_server(monitor_server.handle_connection, host, port)
+
+    print("Servidor iniciado")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        monitor_server.close()
+
+
+def main():
+    host = socket.gethostname()
+    print()
+    port = int(input("Informe a porta do servidor: "))
+    print()
+
+    global history_recorder
+
+    static_facts.get()
+
+    history_recorder = create_history_recorder()
+    sampler.add_listener(record_history)
+    sampler.add_listener(record_rollups)
+    sampler.start()
+
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+    sampler.stop()
+    history_recorder.close()
+    print("Servidor encerrado")
+
 
-connection.close()
-socket.close(0)
-sys.exit()
+if __name__ == "__main__":
+    main()
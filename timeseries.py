@@ -0,0 +1,95 @@
+import time
+
+import numpy
+
+
+class RingBuffer(object):
+    def __init__(self, capacity: int, width: int = None, dtype=numpy.float32):
+        self.capacity = capacity
+        self.width = width
+
+        shape = (capacity * 2,) if width is None else (capacity * 2, width)
+
+        # Every sample is written twice, capacity apart, so any window of the
+        # latest samples is one contiguous slice and can be returned without copying.
+        self._data = numpy.zeros(shape, dtype=dtype)
+        self._index = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def append(self, value):
+        self._data[self._index] = value
+        self._data[self._index + self.capacity] = value
+
+        self._index = (self._index + 1) % self.capacity
+        self._length = min(self._length + 1, self.capacity)
+
+    def view(self, count: int = None) -> numpy.ndarray:
+        count = self._length if count is None else min(count, self._length)
+        end = self._index + self.capacity
+
+        return self._data[end - count:end]
+
+    def last(self):
+        if not self._length:
+            raise IndexError("Empty ring buffer")
+
+        return self._data[self._index + self.capacity - 1]
+
+    def clear(self):
+        self._index = 0
+        self._length = 0
+
+
+class Series(object):
+    def __init__(self, capacity: int, width: int = None, dtype=numpy.float32):
+        self.timestamps = RingBuffer(capacity, dtype=numpy.float64)
+        self.values = RingBuffer(capacity, width, dtype)
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value, timestamp: float):
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+
+
+class TimeSeriesStore(object):
+    def __init__(self, depth: int = 3600, dtype=numpy.float32):
+        self.depth = depth
+        self.dtype = dtype
+
+        self._series = {}
+
+    def __contains__(self, metric: str):
+        return metric in self._series
+
+    def append(self, metric: str, value, timestamp: float = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        width = None if numpy.isscalar(value) else len(value)
+
+        series = self._series.get(metric)
+
+        # Per-core metrics are stored as one row per sample, a change in the number of cores starts over.
+        if series is None or series.values.width != width:
+            series = Series(self.depth, width, self.dtype)
+            self._series[metric] = series
+
+        series.append(value, timestamp)
+
+    def remove(self, metric: str):
+        self._series.pop(metric, None)
+
+    def window(self, metric: str, count: int = None) -> numpy.ndarray:
+        return self._series[metric].values.view(count)
+
+    def timestamps(self, metric: str, count: int = None) -> numpy.ndarray:
+        return self._series[metric].timestamps.view(count)
+
+    def last(self, metric: str):
+        return self._series[metric].values.last()
+
+    def length(self, metric: str) -> int:
+        return len(self._series[metric])